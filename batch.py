@@ -0,0 +1,128 @@
+"""Solves many independent NpuzzleNode and NqueensNode instances on a process pool.
+
+Example
+-------
+>>> results = solve_batch(['1 2 3 4\\n5 6 7 8\\n9 10 0 11\\n13 14 15 12', 7], 'Astar', timeout=10)
+>>> sorted((result.index, result.status, result.cost) for result in results)
+[(0, 'solved', 2), (1, 'solved', 3)]
+"""
+import signal
+import time
+from collections import namedtuple
+from multiprocessing import Pool
+
+import search
+from problems import NpuzzleNode, NqueensNode
+
+ALGORITHMS = {
+    'BFS': search.BFS,
+    'DFS': search.DFS,
+    'Astar': search.Astar,
+    'IDAstar': search.IDAstar,
+}
+
+SOLVED = 'solved'
+NO_SOLUTION = 'no_solution'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+
+class BatchResult(namedtuple('BatchResult', ['index', 'status', 'path', 'cost', 'elapsed', 'error'])):
+    """The outcome of one instance of a batch. It holds no Node, so it is cheap to pickle.
+
+    Attributes
+    ----------
+    index : int
+        The position of the instance in the input list.
+
+    status : str
+        One of SOLVED, NO_SOLUTION, TIMEOUT or ERROR.
+
+    path : list of tuples or None
+        The states (`node.state`) of the solution path, from the initial node to the goal.
+
+    cost : int or float or None
+        The g of the goal node: the number of moves for the puzzle, the number of
+        attacking pairs for the queens.
+
+    elapsed : float
+        The wall-clock time spent on the instance, in seconds.
+
+    error : str or None
+        The exception raised by the search, if the status is ERROR.
+    """
+    __slots__ = ()
+
+
+class _Timeout(Exception):
+    pass
+
+
+def make_root(instance):
+    """Builds the root node of an instance: an NpuzzleNode for an input string,
+    an NqueensNode for a board size.
+    """
+    if isinstance(instance, str):
+        return NpuzzleNode(input_str=instance)
+    if isinstance(instance, int):
+        return NqueensNode(n=instance)
+    raise TypeError('an instance must be a puzzle input string or a queens board size, got {!r}'.format(instance))
+
+
+def solve_batch(instances, algorithm='Astar', processes=None, timeout=None):
+    """Solves the instances on a pool of worker processes and yields each result
+    as soon as its instance is finished, i.e. not in the input order.
+
+    Parameters
+    ----------
+    instances : list of str or int
+        Puzzle input strings (see NpuzzleNode) and/or queens board sizes.
+
+    algorithm : str, optional
+        The name of the search: 'BFS', 'DFS', 'Astar' or 'IDAstar'. Default is 'Astar'.
+
+    processes : int, optional
+        The number of worker processes. Default is the number of CPUs.
+
+    timeout : float, optional
+        The maximum wall-clock time per instance, in seconds. It is enforced with
+        SIGALRM inside the workers, so it is ignored where that is not available.
+
+    Yields
+    ------
+        result : BatchResult
+            The outcome of one instance.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError('unknown algorithm {!r}, expected one of {}'.format(algorithm, sorted(ALGORITHMS)))
+    tasks = [(index, instance, algorithm, timeout) for index, instance in enumerate(instances)]
+    with Pool(processes) as pool:
+        for result in pool.imap_unordered(_solve_one, tasks):
+            yield result
+
+
+def _solve_one(task):
+    index, instance, algorithm, timeout = task
+    alarm = timeout is not None and hasattr(signal, 'setitimer')
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        path = ALGORITHMS[algorithm](make_root(instance))
+    except _Timeout:
+        return BatchResult(index, TIMEOUT, None, None, time.perf_counter() - start, None)
+    except Exception as e:
+        return BatchResult(index, ERROR, None, None, time.perf_counter() - start, repr(e))
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    elapsed = time.perf_counter() - start
+    if path is None:
+        return BatchResult(index, NO_SOLUTION, None, None, elapsed, None)
+    return BatchResult(index, SOLVED, [node.state for node in path], path[-1].g, elapsed, None)
+
+
+def _raise_timeout(signum, frame):
+    raise _Timeout()
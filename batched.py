@@ -0,0 +1,394 @@
+"""Batched BFS and A* for the 15-puzzle, on NumPy arrays of boards.
+
+Instead of one Node per state, a whole BFS layer (or a block of open states
+with the same f in A*) is held as a 2-D uint8 array with one board per row.
+All the children of the batch are generated with a few array operations,
+packed into uint64 keys (4 bits per cell, as in PackedNpuzzleNode) and
+deduplicated with sorting and binary searches. Nodes are only built for the
+final path, so the interpreter overhead per state is gone.
+
+NumPy is optional: the rest of the package works without it, and these
+searches raise ImportError if it is not installed. The boards are at most
+4x4, so that a board fits in a uint64 key.
+
+Example
+-------
+>>> path = BatchedBFS(NpuzzleNode(input_str=initial_state_str))
+>>> path = BatchedAstar(PackedNpuzzleNode(input_str=initial_state_str))
+"""
+import time
+from functools import lru_cache
+
+from budget import BudgetExceeded
+from external_bfs import DistanceTable
+from problems import _manhattan_table, _neighbour_cells, _pack, _transposition
+from search import _child_with_state
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Maximum number of open states expanded at once by BatchedAstar.
+DEFAULT_BLOCK_SIZE = 1 << 14
+
+
+def BatchedBFS(root, stats=None, budget=None):
+    """Runs a breadth-first search one whole layer at a time on arrays of boards.
+    Only the two previous layers are used for duplicate detection: a move can
+    be undone, so a state first reached at depth d has neighbours at depths
+    d - 1, d and d + 1 only.
+
+    Parameters
+    ----------
+    root: NpuzzleNode or PackedNpuzzleNode
+        The start node of the puzzle to be solved, at most 4x4.
+
+    stats: SearchStats, optional
+        Filled with the counters and the total time of the run (per layer,
+        so the per-operation timings are not measured).
+
+    budget: SearchBudget, optional
+        The limits of the run, checked between layers.
+
+    Returns
+    -------
+        path: list of Nodes or None
+            The solution, a path from the initial node to the goal node, made
+            of nodes of the class of the root. If there is no solution it
+            returns None, and if the budget runs out it returns a BudgetExhausted.
+    """
+    size, boards, blanks = _root_arrays(root)
+    goal_key = _goal_key(size)
+    keys = _keys(boards)
+    layers = [(keys, np.array([-1], dtype=np.int64))]
+    previous = np.empty(0, dtype=np.uint64)
+    start = time.perf_counter()
+    if budget is not None:
+        budget.start()
+    try:
+        while len(keys):
+            found = _find(keys, goal_key)
+            if found is not None:
+                return _rebuild_bfs_path(root, layers, found)
+            if budget is not None:
+                budget.check()
+                budget.expansions += len(keys)
+            children, child_blanks, parents = _expand(boards, blanks, size)
+            child_keys = _keys(children)
+            unique_keys, first = np.unique(child_keys, return_index=True)
+            new = ~(_contains(keys, unique_keys) | _contains(previous, unique_keys))
+            if stats is not None:
+                stats.expanded += len(keys)
+                stats.generated += len(child_keys)
+                stats.duplicates += len(child_keys) - int(new.sum())
+                stats.max_frontier = max(stats.max_frontier, len(keys))
+                stats.max_closed = max(stats.max_closed, len(keys) + len(previous))
+            first = first[new]
+            previous, keys = keys, unique_keys[new]
+            boards, blanks = children[first], child_blanks[first]
+            layers.append((keys, parents[first]))
+        return None
+    except BudgetExceeded as e:
+        return budget.exhausted(e.reason)
+    finally:
+        if stats is not None:
+            stats.total_time += time.perf_counter() - start
+
+
+def BatchedAstar(root, block_size=DEFAULT_BLOCK_SIZE, stats=None, budget=None):
+    """Runs the A* algorithm, expanding blocks of open states with the same
+    (f, h) at once on arrays of boards. The heuristic is the one of the root's
+    class, computed for a whole block at once: the Manhattan distance, or the
+    `pattern_db` of an NpuzzleNode subclass (with its transposed lookup).
+
+    The open states are kept in buckets keyed by (f, h), and the lowest one is
+    expanded first (deepest first among equal f). As both heuristics are
+    consistent and every move costs 1, the first time a state is taken from
+    the buckets its g is optimal, so it is then closed and every later copy of
+    it is dropped.
+
+    Parameters
+    ----------
+    root: NpuzzleNode or PackedNpuzzleNode
+        The start node of the puzzle to be solved, at most 4x4.
+
+    block_size: int, optional
+        The maximum number of states expanded at once.
+
+    stats: SearchStats, optional
+        Filled with the counters and the total time of the run.
+
+    budget: SearchBudget, optional
+        The limits of the run, checked between blocks.
+
+    Returns
+    -------
+        path: list of Nodes or None
+            The solution, a path from the initial node to the goal node, made
+            of nodes of the class of the root. If there is no solution it
+            returns None, and if the budget runs out it returns a BudgetExhausted.
+    """
+    size, boards, blanks = _root_arrays(root)
+    goal_key = _goal_key(size)
+    heuristic = _heuristic(root, size)
+    closed = _KeyTable()
+    # (f, h) -> list of (boards, blanks, g, parent keys) chunks
+    buckets = {}
+    h = int(heuristic(boards)[0])
+    buckets[(h, h)] = [(boards, blanks, np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.uint64))]
+    start = time.perf_counter()
+    if budget is not None:
+        budget.start()
+    try:
+        while buckets:
+            bucket = min(buckets)
+            boards, blanks, g, parent_keys = _take(buckets, bucket, block_size)
+            keys = _keys(boards)
+            # Drop the states already closed and the copies within the block
+            # (which have the same g, as they have the same f and h).
+            keys, first = np.unique(keys, return_index=True)
+            fresh = ~closed.contains(keys)
+            keys, first = keys[fresh], first[fresh]
+            if stats is not None:
+                stats.duplicates += len(boards) - len(keys)
+            if not len(keys):
+                continue
+            boards, blanks, g, parent_keys = boards[first], blanks[first], g[first], parent_keys[first]
+            closed.add(keys, parent_keys)
+            if _find(keys, goal_key) is not None:
+                return _rebuild_path(root, closed, goal_key)
+            if budget is not None:
+                budget.check()
+                budget.expansions += len(keys)
+
+            children, child_blanks, parents = _expand(boards, blanks, size)
+            child_keys = _keys(children)
+            open_ = ~closed.contains(child_keys)
+            children, child_blanks, parents, child_keys = (
+                children[open_], child_blanks[open_], parents[open_], child_keys[open_])
+            child_g = g[parents] + 1
+            child_h = heuristic(children)
+            child_f = child_g + child_h
+            if stats is not None:
+                stats.expanded += len(keys)
+                stats.generated += len(open_)
+                stats.duplicates += len(open_) - len(child_keys)
+                stats.max_closed = max(stats.max_closed, len(closed))
+            # The children of a block fall into a few buckets only (h changes by 1 per move).
+            pairs = child_f * (size * size * size * size) + child_h
+            for pair in np.unique(pairs):
+                chosen = pairs == pair
+                f, child_bucket_h = divmod(int(pair), size * size * size * size)
+                buckets.setdefault((f, child_bucket_h), []).append(
+                    (children[chosen], child_blanks[chosen], child_g[chosen], keys[parents[chosen]]))
+            if stats is not None:
+                stats.max_frontier = max(stats.max_frontier,
+                                         sum(len(chunk[0]) for chunks in buckets.values() for chunk in chunks))
+        return None
+    except BudgetExceeded as e:
+        return budget.exhausted(e.reason)
+    finally:
+        if stats is not None:
+            stats.total_time += time.perf_counter() - start
+
+
+class _KeyTable:
+    """A set of uint64 keys, each with a uint64 value, kept as a few sorted runs.
+
+    New keys form a new run; runs of similar sizes are merged, so there are
+    O(log n) runs and a lookup is a binary search in each of them.
+    """
+    def __init__(self):
+        self._runs = []
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self._runs)
+
+    def add(self, keys, values):
+        """Adds sorted, unique keys that are not in the table yet."""
+        while self._runs and len(self._runs[-1][0]) <= 2 * len(keys):
+            old_keys, old_values = self._runs.pop()
+            keys = np.concatenate((old_keys, keys))
+            values = np.concatenate((old_values, values))
+            order = np.argsort(keys, kind='stable')
+            keys, values = keys[order], values[order]
+        self._runs.append((keys, values))
+
+    def contains(self, keys):
+        """Returns a bool array: for each key, whether it is in the table."""
+        found = np.zeros(len(keys), dtype=bool)
+        for run, _ in self._runs:
+            found |= _contains(run, keys)
+        return found
+
+    def get(self, key):
+        """Returns the value of a key of the table."""
+        for run, values in self._runs:
+            index = _find(run, key)
+            if index is not None:
+                return values[index]
+        raise KeyError(key)
+
+
+def _root_arrays(root):
+    """Returns (size, boards, blanks): the board of the root as a 1-row array, and its empty cell."""
+    if np is None:
+        raise ImportError('the batched searches require NumPy')
+    board = root.board
+    size = len(board)
+    if size > 4:
+        raise ValueError('the batched searches support boards of up to 4x4, got {0}x{0}'.format(size))
+    cells = [tile for row in board for tile in row]
+    return size, np.array([cells], dtype=np.uint8), np.array([cells.index(0)], dtype=np.intp)
+
+
+@lru_cache(maxsize=None)
+def _goal_key(size):
+    return np.uint64(_pack(list(range(1, size * size)) + [0]))
+
+
+@lru_cache(maxsize=None)
+def _shifts(n_cells):
+    return np.arange(0, 4 * n_cells, 4, dtype=np.uint64)
+
+
+@lru_cache(maxsize=None)
+def _neighbour_array(size):
+    """neighbours[cell, k]: the k-th cell one move away from `cell`, or -1."""
+    neighbours = np.full((size * size, 4), -1, dtype=np.intp)
+    for cell, cells in enumerate(_neighbour_cells(size)):
+        neighbours[cell, :len(cells)] = cells
+    return neighbours
+
+
+def _heuristic(root, size):
+    """Returns the function computing the heuristic of an array of boards, the
+    same as `evaluate_heuristic` of the root's class.
+    """
+    columns = np.arange(size * size)
+    pattern_db = getattr(root, 'pattern_db', None)
+    if pattern_db is None:
+        distance = np.array(_manhattan_table(size), dtype=np.int64)
+        return lambda boards: distance[boards, columns].sum(axis=1)
+    if isinstance(pattern_db, DistanceTable):
+        return _exact_distance(pattern_db)
+
+    groups = [(list(tiles), np.array(weights, dtype=np.int64), np.frombuffer(table, dtype=np.uint8))
+              for tiles, weights, table in zip(pattern_db.partition, pattern_db._weights, pattern_db._tables)]
+    source, labels = _transposition(size)
+    source, labels = list(source), np.array(labels, dtype=np.uint8)
+
+    def lookup(boards):
+        # positions[b, tile]: the cell of the tile on board b.
+        positions = np.argsort(boards, axis=1)
+        h = np.zeros(len(boards), dtype=np.int64)
+        for tiles, weights, table in groups:
+            h += table[positions[:, tiles] @ weights]
+        return h
+
+    return lambda boards: np.maximum(lookup(boards), lookup(labels[boards[:, source]]))
+
+
+def _exact_distance(table):
+    """The lookup of a DistanceTable for an array of boards. The boards that
+    are not in the table cannot reach the goal and get a huge distance.
+    """
+    keys = np.frombuffer(table.keys, dtype=np.uint64)
+    distances = np.frombuffer(table.distances, dtype=np.uint8).astype(np.int64)
+    unreachable = np.iinfo(np.int64).max // 4
+
+    def lookup(boards):
+        board_keys = _keys(boards)
+        index = np.minimum(np.searchsorted(keys, board_keys), len(keys) - 1)
+        return np.where(keys[index] == board_keys, distances[index], unreachable)
+    return lookup
+
+
+def _keys(boards):
+    """Packs every board (row) into a uint64 with 4 bits per cell."""
+    # The bit fields do not overlap, so their sum is their bitwise or.
+    return (boards.astype(np.uint64) << _shifts(boards.shape[1])).sum(axis=1, dtype=np.uint64)
+
+
+def _expand(boards, blanks, size):
+    """Generates all the children of a batch of boards.
+
+    Returns
+    -------
+        (children, child_blanks, parents) : (arrays)
+            The boards of the children, their empty cells, and the row of the
+            parent of each of them in `boards`.
+    """
+    targets = _neighbour_array(size)[blanks]
+    parents, moves = np.nonzero(targets >= 0)
+    cells = targets[parents, moves]
+    rows = np.arange(len(parents))
+    children = boards[parents]
+    children[rows, blanks[parents]] = children[rows, cells]
+    children[rows, cells] = 0
+    return children, cells, parents
+
+
+def _contains(sorted_keys, keys):
+    """For each of `keys`, whether it is in the sorted array `sorted_keys`."""
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    index = np.searchsorted(sorted_keys, keys)
+    index[index == len(sorted_keys)] = 0
+    return sorted_keys[index] == keys
+
+
+def _find(sorted_keys, key):
+    """Index of `key` in the sorted array `sorted_keys`, or None."""
+    index = int(np.searchsorted(sorted_keys, key))
+    if index < len(sorted_keys) and sorted_keys[index] == key:
+        return index
+    return None
+
+
+def _take(buckets, bucket, block_size):
+    """Removes up to about `block_size` open states from a bucket, as one chunk of arrays."""
+    chunks = buckets[bucket]
+    taken, count = [], 0
+    while chunks and count < block_size:
+        taken.append(chunks.pop())
+        count += len(taken[-1][0])
+    if not chunks:
+        del buckets[bucket]
+    return tuple(np.concatenate(arrays) for arrays in zip(*taken))
+
+
+def _rebuild_bfs_path(root, layers, index):
+    """Follows the parent rows from a state of the last layer back to the root."""
+    keys = []
+    for layer_keys, parents in reversed(layers):
+        keys.append(int(layer_keys[index]))
+        index = parents[index]
+    return _replay(root, reversed(keys))
+
+
+def _rebuild_path(root, closed, goal_key):
+    """Follows the parent keys of the closed states from the goal back to the root."""
+    root_key = _root_key(root)
+    keys = [int(goal_key)]
+    while keys[-1] != root_key:
+        keys.append(int(closed.get(np.uint64(keys[-1]))))
+    return _replay(root, reversed(keys))
+
+
+def _root_key(root):
+    return _pack([tile for row in root.board for tile in row])
+
+
+def _replay(root, keys):
+    """Builds the list of nodes from the root through the states of the packed `keys`."""
+    packed = isinstance(root.state, int)
+    n_cells = len(root.board) ** 2
+    path = [root]
+    keys = iter(keys)
+    next(keys)
+    for key in keys:
+        state = key if packed else tuple((key >> (4 * k)) & 15 for k in range(n_cells))
+        path.append(_child_with_state(path[-1], state))
+    return path
@@ -0,0 +1,285 @@
+"""Reproducible benchmark of the searches on the 15-puzzle and the superqueens.
+
+The puzzle corpus is generated locally and deterministically: every instance
+is a seeded random walk from the goal, with walks of several lengths so that
+the instances spread across solution depths. Every run happens in its own
+process, with a timeout, so the peak RSS can be measured per run.
+
+Example
+-------
+Save a baseline, then compare a later run against it::
+
+    $ python benchmark.py --output baseline.json
+    $ python benchmark.py --output bench_output.json --baseline baseline.json --threshold 0.25
+
+The second command exits with status 1 if a run got slower by more than 25%,
+stopped solving an instance, or returned a different solution cost.
+
+The effect of the NqueensNode heuristic is measured separately, by running A*
+with and without it::
+
+    $ python benchmark.py --queens-heuristic
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+
+import search
+from budget import peak_rss
+from problems import NpuzzleNode, NqueensNode
+
+PUZZLE_ALGORITHMS = ('BFS', 'DFS', 'Astar', 'ARAstar', 'IDAstar', 'BidirectionalBFS', 'BidirectionalAstar')
+QUEENS_ALGORITHMS = ('BFS', 'DFS', 'Astar', 'ARAstar', 'IDAstar')
+
+# The anytime searches yield improving solutions; their result is the last one,
+# which is proven optimal when the run is not cut short.
+ANYTIME_ALGORITHMS = ('ARAstar',)
+
+DEFAULT_SEED = 2024
+DEFAULT_WALKS = (5, 10, 20, 30, 40, 60)
+DEFAULT_PER_WALK = 2
+DEFAULT_QUEENS = range(7, 11)
+HEURISTIC_QUEENS = range(7, 13)
+
+
+class BlindNqueensNode(NqueensNode):
+    """NqueensNode without heuristic (h = 0), i.e. A* is a uniform-cost search."""
+    def evaluate_heuristic(self):
+        return 0
+
+
+_ROOTS = {
+    'npuzzle': lambda instance: NpuzzleNode(input_str=instance),
+    'nqueens': lambda instance: NqueensNode(n=instance),
+    'nqueens-blind': lambda instance: BlindNqueensNode(n=instance),
+}
+
+
+def make_puzzle_corpus(seed=DEFAULT_SEED, walks=DEFAULT_WALKS, per_walk=DEFAULT_PER_WALK, size=4):
+    """Generates the puzzle instances by random walks from the goal.
+
+    The walks never undo their previous move, so the solution depth of an
+    instance is usually close to the length of its walk, and never above it.
+
+    Parameters
+    ----------
+    seed : int, optional
+        The seed of the random walks.
+
+    walks : sequence of int, optional
+        The lengths of the walks.
+
+    per_walk : int, optional
+        The number of instances per walk length.
+
+    size : int, optional
+        The width of the board. Default is 4.
+
+    Returns
+    -------
+        corpus : list of (str, str)
+            The name (e.g. 'walk20-1') and the input string of every instance.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for walk in walks:
+        for k in range(per_walk):
+            node = NpuzzleNode.goal_node(size)
+            previous = None
+            for _ in range(walk):
+                children = [c for c in node.generate_children() if c.state != previous]
+                previous = node.state
+                node = rng.choice(children)
+            corpus.append(('walk{}-{}'.format(walk, k), '\n'.join(' '.join(map(str, row)) for row in node.board)))
+    return corpus
+
+
+def run_benchmark(algorithms=None, seed=DEFAULT_SEED, walks=DEFAULT_WALKS, per_walk=DEFAULT_PER_WALK,
+                  queens=DEFAULT_QUEENS, timeout=10.0):
+    """Runs the algorithms on the puzzle corpus and the queens sizes.
+
+    Returns
+    -------
+        report : dict
+            'meta' describes the machine and the corpus, 'results' holds one dict per run
+            with the keys problem, instance, algorithm, status, wall_time, nodes_per_sec,
+            peak_rss, cost, expanded and generated.
+    """
+    runs = []
+    for name, input_str in make_puzzle_corpus(seed, walks, per_walk):
+        for algorithm in PUZZLE_ALGORITHMS:
+            runs.append(('npuzzle', name, input_str, algorithm))
+    for n in queens:
+        for algorithm in QUEENS_ALGORITHMS:
+            runs.append(('nqueens', 'n{}'.format(n), n, algorithm))
+    if algorithms:
+        runs = [run for run in runs if run[3] in algorithms]
+
+    results = [_run_isolated(problem, name, instance, algorithm, timeout)
+               for problem, name, instance, algorithm in runs]
+    meta = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'walks': list(walks),
+        'per_walk': per_walk,
+        'queens': list(queens),
+        'timeout': timeout,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare(report, baseline, threshold=0.2, min_time=0.05):
+    """Compares a report with a baseline report.
+
+    Parameters
+    ----------
+    threshold : float, optional
+        The relative slowdown above which a run is a regression. Default is 0.2 (20%).
+
+    min_time : float, optional
+        Runs faster than this (in seconds) in the baseline are too noisy to time
+        and are only checked for their status and cost.
+
+    Returns
+    -------
+        regressions : list of str
+            One message per regression, empty if there is none.
+    """
+    previous = {_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        old = previous.get(_key(result))
+        if old is None or old['status'] != 'solved':
+            continue
+        label = '{problem} {instance} {algorithm}'.format(**result)
+        if result['status'] != 'solved':
+            regressions.append('{}: {} (was solved)'.format(label, result['status']))
+        elif result['cost'] != old['cost']:
+            regressions.append('{}: cost {} (was {})'.format(label, result['cost'], old['cost']))
+        elif old['wall_time'] >= min_time and result['wall_time'] > old['wall_time'] * (1 + threshold):
+            regressions.append('{}: {:.3f}s (was {:.3f}s, +{:.0%})'.format(
+                label, result['wall_time'], old['wall_time'], result['wall_time'] / old['wall_time'] - 1))
+    return regressions
+
+
+def compare_queens_heuristic(sizes=HEURISTIC_QUEENS, timeout=60.0):
+    """Runs A* on the queens with the heuristic of NqueensNode and without any.
+
+    Returns
+    -------
+        rows : list of dict
+            One dict per size with the keys n, expanded, blind_expanded, cost,
+            blind_cost, wall_time and blind_wall_time (None for a timed-out run).
+    """
+    rows = []
+    for n in sizes:
+        with_h = _run_isolated('nqueens', 'n{}'.format(n), n, 'Astar', timeout)
+        blind = _run_isolated('nqueens-blind', 'n{}'.format(n), n, 'Astar', timeout)
+        rows.append({'n': n, 'expanded': with_h['expanded'], 'blind_expanded': blind['expanded'],
+                     'cost': with_h['cost'], 'blind_cost': blind['cost'],
+                     'wall_time': with_h['wall_time'], 'blind_wall_time': blind['wall_time']})
+    return rows
+
+
+def _key(result):
+    return result['problem'], result['instance'], result['algorithm']
+
+
+def _run_isolated(problem, name, instance, algorithm, timeout):
+    """Runs one search in a fresh process, so that its peak RSS is its own."""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run_one, args=(problem, instance, algorithm, sender))
+    process.start()
+    sender.close()
+    result = {'problem': problem, 'instance': name, 'algorithm': algorithm, 'status': 'timeout',
+              'wall_time': None, 'nodes_per_sec': None, 'peak_rss': None, 'cost': None,
+              'expanded': None, 'generated': None}
+    if receiver.poll(timeout):
+        try:
+            result.update(receiver.recv())
+        except EOFError:
+            result['status'] = 'error'
+    process.terminate()
+    process.join()
+    return result
+
+
+def _run_one(problem, instance, algorithm, sender):
+    root = _ROOTS[problem](instance)
+    stats = search.SearchStats()
+    start = time.perf_counter()
+    path = getattr(search, algorithm)(root, stats=stats)
+    if algorithm in ANYTIME_ALGORITHMS:
+        path = _last_solution(path)
+    wall_time = time.perf_counter() - start
+    sender.send({
+        'status': 'solved' if path is not None else 'no_solution',
+        'wall_time': wall_time,
+        'nodes_per_sec': stats.generated / wall_time if wall_time > 0 else None,
+        'peak_rss': peak_rss(),
+        'cost': path[-1].g if path is not None else None,
+        'expanded': stats.expanded,
+        'generated': stats.generated,
+    })
+
+
+def _last_solution(rounds):
+    """The path of the last round of an anytime search, None if it found none."""
+    path = None
+    for path, _ in rounds:
+        pass
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the searches on the 15-puzzle and the superqueens.')
+    parser.add_argument('--output', default='bench_output.json', help='the report file (default: bench_output.json)')
+    parser.add_argument('--baseline', help='a previous report to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown counted as a regression (default: 0.2)')
+    parser.add_argument('--algorithms', nargs='+', choices=PUZZLE_ALGORITHMS, help='only run these algorithms')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='seed of the puzzle corpus')
+    parser.add_argument('--walks', type=int, nargs='+', default=DEFAULT_WALKS,
+                        help='lengths of the random walks from the goal')
+    parser.add_argument('--per-walk', type=int, default=DEFAULT_PER_WALK, help='instances per walk length')
+    parser.add_argument('--max-queens', type=int, default=max(DEFAULT_QUEENS), help='largest queens board size')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds per run (default: 10)')
+    parser.add_argument('--queens-heuristic', action='store_true',
+                        help='only compare the expansions of A* on the queens with and without the heuristic')
+    args = parser.parse_args()
+
+    if args.queens_heuristic:
+        print('{:>3} {:>10} {:>10} {:>6} {:>6} {:>9} {:>9}'.format(
+            'n', 'expanded', 'h=0', 'cost', 'h=0', 'time', 'h=0'))
+        for row in compare_queens_heuristic(timeout=args.timeout):
+            print('{:>3} {:>10} {:>10} {:>6} {:>6} {:>9} {:>9}'.format(*[
+                '-' if row[key] is None else round(row[key], 3) if isinstance(row[key], float) else row[key]
+                for key in ('n', 'expanded', 'blind_expanded', 'cost', 'blind_cost', 'wall_time', 'blind_wall_time')]))
+        return
+
+    report = run_benchmark(args.algorithms, args.seed, args.walks, args.per_walk,
+                           range(7, args.max_queens + 1), args.timeout)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for r in report['results']:
+        wall_time = '{:8.3f}s'.format(r['wall_time']) if r['wall_time'] is not None else '        -'
+        print('{:8} {:10} {:18} {:11} {} {}'.format(
+            r['problem'], r['instance'], r['algorithm'], r['status'], wall_time, '-' if r['cost'] is None else r['cost']))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Resource limits for the searches.
+
+Every search entry point accepts a `budget`. When one of its limits is hit,
+the search stops and returns a BudgetExhausted instead of a path, so that
+"out of budget" cannot be confused with "no solution" (None).
+
+Example
+-------
+>>> token = CancellationToken()
+>>> result = Astar(root, budget=SearchBudget(max_expansions=10**6, time_limit=30, cancel=token))
+>>> if isinstance(result, BudgetExhausted):
+...     print(result.reason, result.best_node)
+"""
+import os
+import sys
+import threading
+import time
+from math import inf
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+EXPANSIONS = 'expansions'
+DEADLINE = 'deadline'
+MEMORY = 'memory'
+CANCELLED = 'cancelled'
+
+# The memory use is sampled once every this many expansions.
+_MEMORY_CHECK_INTERVAL = 1024
+
+
+class CancellationToken:
+    """Lets another thread (or a signal handler) stop a running search.
+
+    Attributes
+    ----------
+    cancelled : bool
+        True once `cancel` has been called.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Asks the searches using this token to stop at their next expansion."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class BudgetExhausted:
+    """The outcome of a search stopped by its budget.
+
+    Attributes
+    ----------
+    reason : str
+        The limit that was hit: EXPANSIONS, DEADLINE, MEMORY or CANCELLED.
+
+    best_node : Node or None
+        The node with the lowest heuristic value seen so far, i.e. the best
+        partial solution; `best_node.get_path()` leads to it from the root.
+
+    expansions : int
+        The number of nodes expanded before the search stopped.
+    """
+    __slots__ = ('reason', 'best_node', 'expansions')
+
+    def __init__(self, reason, best_node, expansions):
+        self.reason = reason
+        self.best_node = best_node
+        self.expansions = expansions
+
+    def __repr__(self):
+        return 'BudgetExhausted(reason={!r}, expansions={})'.format(self.reason, self.expansions)
+
+
+class BudgetExceeded(Exception):
+    """Raised inside a search when a limit of its budget is hit. The search
+    entry points catch it and return a BudgetExhausted.
+    """
+    def __init__(self, reason):
+        super(BudgetExceeded, self).__init__(reason)
+        self.reason = reason
+
+
+class SearchBudget:
+    """Limits of a search. Every limit is optional.
+
+    A budget keeps the counters of the search that uses it, so it must not
+    be shared by searches running at the same time.
+
+    Parameters
+    ----------
+    max_expansions : int, optional
+        The maximum number of nodes expanded.
+
+    time_limit : float, optional
+        The maximum wall-clock time of the search, in seconds from its start.
+
+    deadline : float, optional
+        An absolute `time.monotonic()` time at which the search must stop.
+
+    max_memory : int, optional
+        An approximate ceiling on the memory of the process, in bytes. The
+        resident set size is sampled every 1024 expansions.
+
+    cancel : CancellationToken, optional
+        A token that stops the search when it is cancelled.
+    """
+    def __init__(self, max_expansions=None, time_limit=None, deadline=None, max_memory=None, cancel=None):
+        self.max_expansions = max_expansions
+        self.time_limit = time_limit
+        self.deadline = deadline
+        self.max_memory = max_memory
+        self.cancel = cancel
+        self.expansions = 0
+        self.best_node = None
+        self._best_h = inf
+        self._stop_at = None
+
+    def start(self):
+        """Resets the counters at the start of a search."""
+        self.expansions = 0
+        self.best_node = None
+        self._best_h = inf
+        stop_at = [] if self.deadline is None else [self.deadline]
+        if self.time_limit is not None:
+            stop_at.append(time.monotonic() + self.time_limit)
+        self._stop_at = min(stop_at) if stop_at else None
+
+    def charge(self):
+        """Accounts for the expansion of a node.
+
+        Raises
+        ------
+        BudgetExceeded
+            If one of the limits has been reached.
+        """
+        self.check()
+        self.expansions += 1
+
+    def check(self, memory=True):
+        """Raises BudgetExceeded if one of the limits has been reached. The memory
+        limit is only checked if `memory` is true, once every 1024 expansions.
+        """
+        if self.cancel is not None and self.cancel.cancelled:
+            raise BudgetExceeded(CANCELLED)
+        if self.max_expansions is not None and self.expansions >= self.max_expansions:
+            raise BudgetExceeded(EXPANSIONS)
+        if self._stop_at is not None and time.monotonic() >= self._stop_at:
+            raise BudgetExceeded(DEADLINE)
+        if (memory and self.max_memory is not None and self.expansions % _MEMORY_CHECK_INTERVAL == 0
+                and _memory_use() > self.max_memory):
+            raise BudgetExceeded(MEMORY)
+
+    def observe(self, node):
+        """Keeps `node` as the best partial solution if its heuristic is the lowest seen."""
+        h = node.f - node.g
+        if h < self._best_h:
+            self._best_h = h
+            self.best_node = node
+
+    def exhausted(self, reason):
+        """Builds the outcome of a search stopped for `reason`."""
+        return BudgetExhausted(reason, self.best_node, self.expansions)
+
+
+def _memory_use():
+    """Current resident set size of the process in bytes, or the peak one where it is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        pass
+    return peak_rss() or 0
+
+
+def peak_rss():
+    """Peak resident set size of this process, in bytes (None where it cannot be measured)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
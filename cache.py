@@ -0,0 +1,384 @@
+"""A persistent cache of solutions and goal distances in front of the searches.
+
+`SolutionCache.solve(search, root, **options)` returns the same result as
+`search(root, **options)`, but first looks for a solution of the same start
+state, problem and algorithm. The results are kept in two tiers: a bounded
+in-process LRU, and optionally an SQLite file shared by runs and processes,
+with its own bound on the number of rows (the least recently used ones are
+evicted first).
+
+When the search is optimal (`Astar` with weight 1, `IDAstar`), every state of
+the returned path is also recorded with its exact distance to the goal and
+the next state of the path. A later search from any of these states is then
+answered from the cache, and a search that reaches one of them uses the
+distance as a perfect heuristic and stops there: the node of a cached state
+is treated as a goal of cost g + distance, and the rest of the path is
+spliced from the cache. The cached distances of the problem are read once
+before such a search, which then never queries the file. As A* and IDA* only stop on a node whose f is a lower
+bound of every other solution, the result is still optimal.
+
+The states are stored as their `repr` and read back with
+`ast.literal_eval`, so they must be made of ints, tuples and lists, as the
+states of the problems of this package are.
+
+Example
+-------
+>>> with SolutionCache('solutions.sqlite', max_entries=10000, max_disk_entries=10**6) as cache:
+...     solve = cache.cached(Astar)
+...     path = solve(NpuzzleNode(input_str=initial_state_str))
+"""
+import ast
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from node import Node
+from search import _child_with_state
+
+# Searches whose paths are optimal, hence give the exact goal distance of every state on them.
+EXACT_SEARCHES = ('Astar', 'IDAstar')
+
+# Options of the searches that do not change their result, left out of the cache key.
+_RUN_OPTIONS = frozenset(('stats', 'on_expand', 'budget', 'checkpoint', 'lightweight', 'on_iteration'))
+
+_MISSING = object()
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS solutions (
+    problem TEXT, algorithm TEXT, state TEXT, path TEXT, used INTEGER,
+    PRIMARY KEY (problem, algorithm, state));
+CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used);
+CREATE TABLE IF NOT EXISTS distances (
+    problem TEXT, state TEXT, distance REAL, next_state TEXT, used INTEGER,
+    PRIMARY KEY (problem, state));
+CREATE INDEX IF NOT EXISTS distances_used ON distances (used);
+'''
+
+
+class SolutionCache:
+    """Solutions and exact goal distances of earlier searches.
+
+    Parameters
+    ----------
+    path : str, optional
+        The SQLite file of the on-disk tier, created if needed. Default is None:
+        the cache only lives in memory.
+
+    max_entries : int, optional
+        The number of solutions and distances kept in memory. Default is 100000.
+
+    max_disk_entries : int, optional
+        The number of rows kept in each table of the file. Default is None (no limit).
+
+    use_distances : bool, optional
+        Lets the optimal searches stop at the states of known goal distance.
+        Default is True.
+
+    Attributes
+    ----------
+    hits : int
+        The number of searches answered by the cache, without searching.
+
+    misses : int
+        The number of searches that had to run.
+    """
+    def __init__(self, path=None, max_entries=100000, max_disk_entries=None, use_distances=True):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.use_distances = use_distances
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+
+    def solve(self, search, root, **options):
+        """Runs `search(root, **options)`, or answers it from the cache.
+
+        Parameters
+        ----------
+        search : callable
+            A search entry point, e.g. `search.Astar`.
+
+        root : Node
+            The start node of the problem to be solved.
+
+        **options
+            The other arguments of the search. The ones that do not change its
+            result (stats, on_expand, budget, ...) are left out of the cache key.
+
+        Returns
+        -------
+            path: list of Nodes or None
+                The solution, from `root` to the goal node, None if there is no
+                solution, or a BudgetExhausted (which is not cached).
+        """
+        problem = _problem(root)
+        algorithm = _algorithm(search, options)
+        exact = search.__name__ in EXACT_SEARCHES and options.get('weight', 1) == 1
+        # The rows used by one call share their time of use (see `_evict`).
+        used = time.time_ns()
+        states = self._get(('solution', problem, algorithm, root.state), _SOLUTIONS, (problem, algorithm), used)
+        if states is _MISSING and exact:
+            states = self._chain(problem, root.state, used)
+        if states is not _MISSING:
+            self._commit()
+            self.hits += 1
+            return None if states is None else _rebuild(root, states)
+        self.misses += 1
+
+        result = _MISSING
+        if exact and self.use_distances:
+            result = self._search_with_distances(search, root, problem, options, used)
+        if result is _MISSING:
+            result = search(root, **options)
+        if result is None or isinstance(result, list):
+            self._record(problem, algorithm, root, result, exact, used)
+        return result
+
+    def cached(self, search):
+        """Returns `search` with this cache in front of it."""
+        @wraps(search)
+        def cached_search(root, **options):
+            return self.solve(search, root, **options)
+        return cached_search
+
+    def goal_distance(self, node):
+        """Returns the exact number of moves (cost) from `node` to the goal, or
+        None if the state of the node is not on a cached optimal path.
+        """
+        known = self._get(('distance', _problem(node), node.state), _DISTANCES, (_problem(node),), time.time_ns())
+        self._commit()
+        return None if known is _MISSING else known[0]
+
+    def close(self):
+        """Closes the file of the on-disk tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _search_with_distances(self, search, root, problem, options, used):
+        """Runs the search on a copy of the root whose class knows the cached
+        distances, and splices the cached end of the path.
+
+        Returns
+        -------
+            path: list of Nodes or None
+                The result of the search, with a path from `root`, or _MISSING
+                if no distance of the problem is cached or the cached end of
+                the path was evicted in the meantime.
+        """
+        # A node is generated far more often than a file query is answered, so
+        # the search only looks the states up in a dict read beforehand.
+        distances = self._distances(problem)
+        if not distances:
+            return _MISSING
+        result = search(_recast(root, _class_with_distances(type(root), distances.get)), **options)
+        if not isinstance(result, list):
+            return result
+        states = [node.state for node in result]
+        if not result[-1].is_goal_state():
+            end = self._chain(problem, states[-1], used)
+            if end is _MISSING:
+                self._commit()
+                return _MISSING
+            states += end[1:]
+        return _rebuild(root, states)
+
+    def _distances(self, problem):
+        """The cached goal distances of the states of a problem, in both tiers, by state."""
+        with self._lock:
+            distances = {}
+            if self._db is not None:
+                rows = self._db.execute('SELECT state, distance FROM distances WHERE problem = ?', (problem,))
+                distances.update((ast.literal_eval(state), _decode_distance((distance, None))[0])
+                                 for state, distance in rows)
+            distances.update((key[2], value[0]) for key, value in self._memory.items()
+                             if key[0] == 'distance' and key[1] == problem)
+            return distances
+
+    def _chain(self, problem, state, used):
+        """The states of the cached optimal path from `state` to the goal, or
+        _MISSING if one of them is not cached.
+        """
+        states = [state]
+        while True:
+            known = self._get(('distance', problem, state), _DISTANCES, (problem,), used)
+            if known is _MISSING:
+                return _MISSING
+            state = known[1]
+            if state is None:
+                return states
+            states.append(state)
+
+    def _get(self, key, table, arguments, used):
+        """Looks `key` up in memory, then in the `table` of the file (_SOLUTIONS
+        or _DISTANCES). The row found in the file is marked as used at `used`
+        (in time.time_ns() units), which is committed with the next result
+        recorded or by `_commit`.
+        """
+        with self._lock:
+            value = self._memory.get(key, _MISSING)
+            if value is not _MISSING:
+                self._memory.move_to_end(key)
+                return value
+            if self._db is None:
+                return _MISSING
+            select, update, decode = table
+            row = self._db.execute(select, arguments + (repr(key[-1]),)).fetchone()
+            if row is None:
+                return _MISSING
+            value = decode(row)
+            self._db.execute(update, (used,) + arguments + (repr(key[-1]),))
+            self._remember(key, value)
+            return value
+
+    def _commit(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _record(self, problem, algorithm, root, path, exact, used):
+        """Stores a result, and the goal distances of its states if it is optimal."""
+        states = None if path is None else [node.state for node in path]
+        distances = []
+        if exact and path is not None:
+            goal_g = path[-1].g
+            next_states = states[1:] + [None]
+            distances = [(state, goal_g - node.g, next_state)
+                         for state, node, next_state in zip(states, path, next_states)]
+        with self._lock:
+            self._remember(('solution', problem, algorithm, root.state), states)
+            for state, distance, next_state in distances:
+                self._remember(('distance', problem, state), (distance, next_state))
+            if self._db is None:
+                return
+            self._db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)',
+                             (problem, algorithm, repr(root.state), None if states is None else repr(states), used))
+            self._db.executemany('INSERT OR REPLACE INTO distances VALUES (?, ?, ?, ?, ?)',
+                                 [(problem, repr(state), distance, None if next_state is None else repr(next_state), used)
+                                  for state, distance, next_state in distances])
+            if self.max_disk_entries is not None:
+                for table in ('solutions', 'distances'):
+                    self._evict(table)
+            self._db.commit()
+
+    def _evict(self, table):
+        """Deletes the least recently used rows of a table over `max_disk_entries`.
+
+        All the rows recorded or read by one call of `solve` (or
+        `goal_distance`) share its time of use, and a path is always read from
+        one of its states to the goal. The next state of a row is then never
+        used less recently than the row itself, and as the rows go from the
+        least recently used, the remaining paths stay complete up to the goal.
+        """
+        excess = self._db.execute('SELECT COUNT(*) FROM {}'.format(table)).fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            self._db.execute('DELETE FROM {0} WHERE used <= (SELECT used FROM {0} ORDER BY used LIMIT 1 OFFSET ?)'
+                             .format(table), (excess - 1,))
+
+
+def _decode_solution(row):
+    """The list of states of a cached solution, None if there is none."""
+    return None if row[0] is None else ast.literal_eval(row[0])
+
+
+def _decode_distance(row):
+    """The (distance, next state) of a cached state, the next state being None at the goal."""
+    distance, next_state = row
+    if distance == int(distance):
+        distance = int(distance)
+    return distance, None if next_state is None else ast.literal_eval(next_state)
+
+
+# For each tier of the file: the query of the value of a key, the update of
+# its time of use, and the decoder of the value.
+_SOLUTIONS = ('SELECT path FROM solutions WHERE problem = ? AND algorithm = ? AND state = ?',
+              'UPDATE solutions SET used = ? WHERE problem = ? AND algorithm = ? AND state = ?',
+              _decode_solution)
+_DISTANCES = ('SELECT distance, next_state FROM distances WHERE problem = ? AND state = ?',
+              'UPDATE distances SET used = ? WHERE problem = ? AND state = ?',
+              _decode_distance)
+
+
+def _problem(node):
+    """The name of the problem of a node: its class, and the board size of the
+    queens, whose states do not tell it (the empty board is the root of every size).
+    """
+    name = '{}.{}'.format(type(node).__module__, type(node).__qualname__)
+    n = getattr(node, 'n', None)
+    return name if n is None else '{}(n={})'.format(name, n)
+
+
+def _algorithm(search, options):
+    """The name of a search with the options that change its result."""
+    kept = sorted((name, value) for name, value in options.items() if name not in _RUN_OPTIONS)
+    return '{}({})'.format(search.__name__, ', '.join('{}={!r}'.format(name, value) for name, value in kept))
+
+
+def _rebuild(root, states):
+    """Rebuilds the nodes of a path of states from the root, as `get_path` would return them."""
+    path = [root]
+    for state in states[1:]:
+        path.append(_child_with_state(path[-1], state))
+    return path
+
+
+def _class_with_distances(node_class, lookup):
+    """A subclass of `node_class` whose heuristic is the cached goal distance
+    when there is one, and whose nodes with a cached distance are goals.
+    """
+    class CachedNode(node_class):
+        # The nodes of cached states are goals, so they are never expanded, and the
+        # other nodes keep the heuristic of `node_class` and its incremental updates.
+        overlays_heuristic = True
+
+        def evaluate_heuristic(self):
+            # Node.__init__ reads the state right after the heuristic: it is only built once.
+            self._known_state = state = node_class._get_state(self)
+            distance = lookup(state)
+            if distance is not None:
+                return distance
+            return node_class.evaluate_heuristic(self)
+
+        def _get_state(self):
+            return self._known_state
+
+        def is_goal(self):
+            return lookup(self.state) is not None or node_class.is_goal(self)
+
+        def is_goal_state(self):
+            return node_class.is_goal(self)
+
+    CachedNode.__qualname__ = CachedNode.__name__ = 'Cached' + node_class.__name__
+    return CachedNode
+
+
+def _recast(node, node_class):
+    """Copies a root node into an instance of a subclass of its class."""
+    copy = node_class.__new__(node_class)
+    for cls in type(node).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name != '__dict__' and hasattr(node, name):
+                setattr(copy, name, getattr(node, name))
+    copy.__dict__.update(getattr(node, '__dict__', {}))
+    Node.__init__(copy, None, node.g)
+    return copy
@@ -0,0 +1,152 @@
+"""Snapshots of long searches, to resume them after a restart.
+
+`Astar` and `IDAstar` accept a `checkpoint`, which saves the state of the
+search to a file from time to time, when it is requested (e.g. from a signal
+handler) and when the search is stopped by its budget. `resume` goes on from
+the last snapshot to the same result as a run that was never interrupted.
+
+The A* snapshot holds the compact records of the lightweight mode (see
+records.py), the frontier as (priority, index) entries and the closed set as
+indices, so no Node is written; the frontier nodes are rebuilt from the root
+when the search is resumed. The IDA* snapshot only holds the threshold and
+the moves of the branch being explored.
+
+Example
+-------
+>>> token = CancellationToken()
+>>> saver = Checkpoint('run.ckpt', interval=600)
+>>> saver.on_signal(signal.SIGUSR1)
+>>> signal.signal(signal.SIGTERM, lambda signum, frame: token.cancel())
+>>> result = Astar(root, checkpoint=saver, budget=SearchBudget(cancel=token))
+
+and after a restart::
+
+>>> result = resume('run.ckpt', checkpoint=Checkpoint('run.ckpt', interval=600))
+"""
+import os
+import pickle
+import signal
+import time
+
+import search
+from instrumentation import Probe
+
+VERSION = 1
+
+
+class Checkpoint:
+    """Where and when a search saves its snapshots.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot file. Every snapshot replaces the previous one, through
+        a temporary file, so the file always holds a complete snapshot.
+
+    interval : float, optional
+        The number of seconds between two periodic snapshots. Default is None:
+        snapshots are only saved on request and when the budget runs out.
+
+    Attributes
+    ----------
+    saves : int
+        The number of snapshots saved.
+    """
+    def __init__(self, path, interval=None):
+        self.path = path
+        self.interval = interval
+        self.saves = 0
+        self._requested = False
+        self._next = None if interval is None else time.monotonic() + interval
+
+    def request(self):
+        """Asks the search to save a snapshot at its next expansion. It is safe
+        to call from a signal handler or another thread.
+        """
+        self._requested = True
+
+    def on_signal(self, signum=signal.SIGUSR1):
+        """Installs a handler that requests a snapshot when `signum` is received
+        (from the main thread only).
+        """
+        signal.signal(signum, lambda signum, frame: self.request())
+
+    def due(self):
+        """True when a snapshot has been requested or the interval has elapsed."""
+        return self._requested or (self._next is not None and time.monotonic() >= self._next)
+
+    def save(self, snapshot):
+        """Writes a snapshot (a dict built by the search) to the file."""
+        snapshot['version'] = VERSION
+        with open(self.path + '.tmp', 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + '.tmp', self.path)
+        self.saves += 1
+        self._requested = False
+        if self.interval is not None:
+            self._next = time.monotonic() + self.interval
+
+
+def load(path):
+    """Reads a snapshot written by a Checkpoint.
+
+    Returns
+    -------
+        snapshot : dict
+            The state of the search; 'search' is the name of the algorithm and
+            'root' the start node.
+    """
+    with open(path, 'rb') as f:
+        snapshot = pickle.load(f)
+    if not isinstance(snapshot, dict) or snapshot.get('version') != VERSION:
+        raise ValueError('{} is not a search snapshot'.format(path))
+    return snapshot
+
+
+def resume(path, stats=None, on_expand=None, budget=None, checkpoint=None, on_iteration=None):
+    """Goes on with the search saved in a snapshot file.
+
+    Parameters
+    ----------
+    path : str
+        The file of a Checkpoint used by `Astar` or `IDAstar`.
+
+    stats: SearchStats, optional
+        Filled with the counters and timings of the run, added to the ones of
+        the snapshot if it was taken with stats.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the resumed run. Its counters start from zero.
+
+    checkpoint: Checkpoint, optional
+        Where the resumed run saves its own snapshots.
+
+    on_iteration: callable, optional
+        Called with the f-threshold at the start of every iteration of IDA*.
+
+    Returns
+    -------
+        path: list of Nodes or None
+            The same result as the interrupted search would have returned:
+            the solution from the saved root node to the goal node, None if
+            there is no solution, or a BudgetExhausted if the budget runs out.
+    """
+    snapshot = load(path)
+    if stats is not None and snapshot['stats'] is not None:
+        for field, value in snapshot['stats'].items():
+            if field.startswith('max_'):
+                setattr(stats, field, max(getattr(stats, field), value))
+            else:
+                setattr(stats, field, getattr(stats, field) + value)
+    probe = Probe(stats, on_expand, budget)
+    if snapshot['search'] == 'Astar':
+        key = search._canonical_state if snapshot['symmetry'] else search._state
+        return search._lightweight_Astar(snapshot['root'], probe, snapshot['weight'], key, checkpoint, snapshot)
+    if snapshot['search'] == 'IDAstar':
+        return search._IDAstar(snapshot['root'], probe, on_iteration, checkpoint, snapshot)
+    raise ValueError('cannot resume a {} search'.format(snapshot['search']))
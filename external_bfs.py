@@ -0,0 +1,469 @@
+"""Breadth-first sweep of a whole sliding puzzle state space, on disk.
+
+The state spaces of the larger puzzles do not fit in the `visited` set of
+`search.BFS`. `sweep` keeps its layers in files instead, with delayed
+duplicate detection:
+
+- the states of a layer are packed into 64-bit keys (4 bits per cell, as in
+  PackedNpuzzleNode) and stored sorted, one file per layer;
+- the children of a layer are buffered in memory up to `run_size` keys, then
+  sorted and written as a run file;
+- the runs are merged into the next layer, and the states of the current and
+  previous layers are dropped by the same streaming merge (a move can be
+  undone, so a state first reached at depth d has neighbours at depths
+  d - 1, d and d + 1 only);
+- the layer and run files are read through memory maps.
+
+After every layer, a manifest records the layer counts, so a sweep that
+crashed or ran out of budget is resumed by calling `sweep` again on the same
+directory. With `distances=True` every layer is kept and finally merged into
+a table of the distance of every state to the start, by default the goal.
+`load` memory-maps that table; its `evaluate` method has the same signature
+as `pattern_db.PatternDatabase.evaluate`, so it can be the exact heuristic
+of an NpuzzleNode subclass.
+
+The files are written in the byte order of the machine.
+
+Example
+-------
+Sweep the 8-puzzle once (offline)::
+
+    $ python external_bfs.py 8puzzle --size 3 --distances
+
+and use the distances as the heuristic of a node class::
+
+    >>> class ExactNpuzzleNode(NpuzzleNode):
+    ...     pattern_db = external_bfs.load('8puzzle/distances.bin')
+    >>> path = Astar(ExactNpuzzleNode(input_str=initial_state_str))
+"""
+import argparse
+import heapq
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from math import inf
+
+from budget import BudgetExceeded
+from problems import _pack, _packed_goal, _packed_moves
+
+MAGIC = b'NDST'
+VERSION = 1
+
+MANIFEST = 'manifest.json'
+DISTANCE_FILE = 'distances.bin'
+
+# Maximum number of keys buffered in memory before a run is written.
+DEFAULT_RUN_SIZE = 1 << 22
+
+# Keys written to a file at once.
+_WRITE_CHUNK = 1 << 16
+
+# The budget is checked once every this many expanded states.
+_CHECK_INTERVAL = 4096
+
+_HEADER = struct.Struct('<4sBB2xQ')
+
+
+class DistanceTable:
+    """The distance of every state of a sweep to its start, backed by a
+    memory-mapped file written by `sweep`.
+
+    Parameters
+    ----------
+    size : int
+        The width of the board.
+
+    keys : sequence of int
+        The packed states, sorted.
+
+    distances : sequence of int
+        The distance of the state of the same index in `keys`.
+
+    Attributes
+    ----------
+    size : int
+        The width of the board.
+    """
+    def __init__(self, size, keys, distances, mapping=None):
+        self.size = size
+        self.keys = keys
+        self.distances = distances
+        self._mapping = mapping
+
+    def __len__(self):
+        return len(self.keys)
+
+    def evaluate(self, cells):
+        """Looks up the distance of a board.
+
+        Parameters
+        ----------
+        cells : sequence of int
+            The tile on each cell, row by row (e.g. `node.state` of an NpuzzleNode).
+
+        Returns
+        -------
+            distance : int or float
+                The number of moves between the board and the start of the
+                sweep, inf if the board cannot reach it.
+        """
+        key = _pack(cells)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.distances[i]
+        return inf
+
+    def close(self):
+        """Releases the memory map, if the table was loaded from a file."""
+        if self._mapping is not None:
+            self.keys.release()
+            self.distances.release()
+            self.keys, self.distances = (), ()
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def sweep(directory, size=3, start=None, distances=False, max_depth=None,
+          run_size=DEFAULT_RUN_SIZE, stats=None, budget=None):
+    """Runs a breadth-first search over all the states reachable from `start`,
+    keeping the layers in files of `directory`. If the directory holds an
+    unfinished sweep of the same puzzle, it is resumed from its last complete
+    layer.
+
+    Parameters
+    ----------
+    directory : str
+        The working directory, created if needed.
+
+    size : int, optional
+        The width of the board, at most 4. Default is 3.
+
+    start : sequence of int, optional
+        The tiles of the start board, row by row. Default is the goal, so that
+        the distances are the numbers of moves needed to solve every board.
+
+    distances : bool, optional
+        Keeps every layer and writes the distance table `DISTANCE_FILE` in
+        `directory` when the sweep is complete. Default is False.
+
+    max_depth : int, optional
+        Stops after the layer of this depth; a later call with a larger
+        `max_depth` goes on from there.
+
+    run_size : int, optional
+        The maximum number of keys sorted in memory at once.
+
+    stats : SearchStats, optional
+        Filled with the counters and the total time of the run.
+
+    budget : SearchBudget, optional
+        The limits of the run. The layer being built when it runs out is
+        discarded, and the next call resumes before it.
+
+    Returns
+    -------
+        counts : list of int
+            The number of states at every depth, from the start. If the budget
+            runs out it returns a BudgetExhausted instead.
+    """
+    if not 2 <= size <= 4:
+        raise ValueError('the board must be 2x2 to 4x4, not {0}x{0}'.format(size))
+    start_key = _packed_goal(size) if start is None else _pack(start)
+    os.makedirs(directory, exist_ok=True)
+    manifest = _open_manifest(directory, size, start_key, distances)
+    counts = manifest['counts']
+    began = time.perf_counter()
+    if budget is not None:
+        budget.start()
+    try:
+        while not manifest['complete'] and (max_depth is None or len(counts) <= max_depth):
+            depth = len(counts)
+            count = _next_layer(directory, depth, size, run_size, stats, budget)
+            if count:
+                counts.append(count)
+            else:
+                manifest['complete'] = True
+            _save_manifest(directory, manifest)
+            if not distances and depth >= 2:
+                _remove(_layer_path(directory, depth - 2))
+        if manifest['complete'] and distances and not os.path.exists(os.path.join(directory, DISTANCE_FILE)):
+            _write_distances(directory, size, counts)
+        return list(counts)
+    except BudgetExceeded as e:
+        return budget.exhausted(e.reason)
+    finally:
+        if stats is not None:
+            stats.total_time += time.perf_counter() - began
+
+
+def load(path):
+    """Memory-maps a distance table written by `sweep`.
+
+    Parameters
+    ----------
+    path : str
+        The file `DISTANCE_FILE` of the directory of a sweep run with `distances=True`.
+
+    Returns
+    -------
+        table : DistanceTable
+            The distances, backed by a read-only memory map of the file.
+    """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, size, count = _HEADER.unpack_from(mapping)
+    if magic != MAGIC or version != VERSION:
+        mapping.close()
+        raise ValueError('{} is not a distance table file'.format(path))
+    view = memoryview(mapping)
+    keys_end = _HEADER.size + 8 * count
+    keys = view[_HEADER.size:keys_end].cast('Q')
+    distances = view[keys_end:keys_end + count]
+    view.release()
+    return DistanceTable(size, keys, distances, mapping)
+
+
+def _open_manifest(directory, size, start_key, distances):
+    """Reads the manifest of the directory, or starts a new sweep with the
+    start layer, and removes the files of an unfinished layer.
+    """
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest['size'] != size or manifest['start'] != start_key:
+            raise ValueError('{} holds the sweep of another puzzle'.format(directory))
+        if distances and not manifest['distances']:
+            raise ValueError('{} holds a sweep that did not keep its layers'.format(directory))
+        manifest['distances'] = distances
+    else:
+        manifest = {'size': size, 'start': start_key, 'distances': distances, 'counts': [], 'complete': False}
+    if not manifest['counts']:
+        with _LayerWriter(_layer_path(directory, 0)) as writer:
+            writer.write(start_key)
+        manifest['counts'] = [1]
+        _save_manifest(directory, manifest)
+    done = len(manifest['counts'])
+    for name in os.listdir(directory):
+        if name.endswith('.tmp') or name.startswith('run-'):
+            _remove(os.path.join(directory, name))
+        elif name.startswith('layer-'):
+            depth = int(name[len('layer-'):-len('.bin')])
+            if depth >= done or (not distances and depth < done - 2):
+                _remove(os.path.join(directory, name))
+    return manifest
+
+
+def _save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _next_layer(directory, depth, size, run_size, stats, budget):
+    """Expands the layer depth - 1 into sorted runs, then merges them into the
+    layer `depth`, without the states of the two previous layers.
+
+    Returns
+    -------
+        count : int
+            The number of states of the new layer.
+    """
+    runs = []
+    buffer = array('Q')
+    n_cells = size * size
+    expanded = generated = 0
+    with _mapped(_layer_path(directory, depth - 1)) as layer:
+        for key in layer:
+            if budget is not None and expanded % _CHECK_INTERVAL == 0:
+                budget.check()
+            expanded += 1
+            blank = _blank(key, n_cells)
+            for child, _, _ in _packed_moves(key, blank, size):
+                buffer.append(child)
+            if len(buffer) >= run_size:
+                generated += len(buffer)
+                runs.append(_write_run(directory, len(runs), buffer))
+                buffer = array('Q')
+    generated += len(buffer)
+    if buffer or not runs:
+        runs.append(_write_run(directory, len(runs), buffer))
+    if budget is not None:
+        budget.expansions += expanded
+
+    previous = [_layer_path(directory, d) for d in (depth - 1, depth - 2) if d >= 0]
+    with _mapped_all(runs) as run_views, _mapped_all(previous) as previous_views:
+        new = _difference(_unique(heapq.merge(*run_views)), heapq.merge(*previous_views))
+        with _LayerWriter(_layer_path(directory, depth)) as writer:
+            for key in new:
+                writer.write(key)
+    for run in runs:
+        _remove(run)
+    if stats is not None:
+        stats.expanded += expanded
+        stats.generated += generated
+        stats.duplicates += generated - writer.count
+        stats.max_frontier = max(stats.max_frontier, expanded)
+    return writer.count
+
+
+def _write_run(directory, index, keys):
+    path = os.path.join(directory, 'run-{}.bin'.format(index))
+    keys = array('Q', sorted(set(keys)))
+    with open(path, 'wb') as f:
+        keys.tofile(f)
+    return path
+
+
+def _write_distances(directory, size, counts):
+    """Merges the layers into the distance table: the sorted keys, then the
+    distance of every key.
+    """
+    total = sum(counts)
+    path = os.path.join(directory, DISTANCE_FILE)
+    layers = [_layer_path(directory, depth) for depth in range(len(counts))]
+    with _mapped_all(layers) as views, open(path + '.tmp', 'wb') as keys_file:
+        keys_file.write(_HEADER.pack(MAGIC, VERSION, size, total))
+        keys_file.truncate(_HEADER.size + 9 * total)
+        with open(path + '.tmp', 'r+b') as distances_file:
+            distances_file.seek(_HEADER.size + 8 * total)
+            keys, depths = array('Q'), bytearray()
+            for key, depth in heapq.merge(*(_tagged(view, depth) for depth, view in enumerate(views))):
+                keys.append(key)
+                depths.append(depth)
+                if len(keys) >= _WRITE_CHUNK:
+                    keys.tofile(keys_file)
+                    distances_file.write(depths)
+                    keys, depths = array('Q'), bytearray()
+            keys.tofile(keys_file)
+            distances_file.write(depths)
+    os.replace(path + '.tmp', path)
+
+
+def _tagged(keys, depth):
+    for key in keys:
+        yield key, depth
+
+
+def _unique(keys):
+    """Drops the repeats from a sorted iterable."""
+    last = None
+    for key in keys:
+        if key != last:
+            yield key
+            last = key
+
+
+def _difference(keys, excluded):
+    """Yields the keys of the sorted iterable `keys` that are not in the sorted iterable `excluded`."""
+    excluded = iter(excluded)
+    other = next(excluded, None)
+    for key in keys:
+        while other is not None and other < key:
+            other = next(excluded, None)
+        if key != other:
+            yield key
+
+
+def _blank(key, n_cells):
+    """The empty cell of a packed board."""
+    for cell in range(n_cells):
+        if not (key >> (4 * cell)) & 15:
+            return cell
+    raise ValueError('the board has no empty cell')
+
+
+def _layer_path(directory, depth):
+    return os.path.join(directory, 'layer-{}.bin'.format(depth))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def _mapped(path):
+    """Memory-maps a file of keys and yields it as a sequence of int."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield ()
+            return
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping).cast('Q')
+    try:
+        yield view
+    finally:
+        view.release()
+        mapping.close()
+
+
+@contextmanager
+def _mapped_all(paths):
+    views = []
+    with ExitStack() as stack:
+        for path in paths:
+            views.append(stack.enter_context(_mapped(path)))
+        yield views
+
+
+class _LayerWriter:
+    """Writes keys to a file in chunks, through a temporary file renamed when complete."""
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._keys = array('Q')
+        self._file = open(path + '.tmp', 'wb')
+
+    def write(self, key):
+        self._keys.append(key)
+        self.count += 1
+        if len(self._keys) >= _WRITE_CHUNK:
+            self._keys.tofile(self._file)
+            self._keys = array('Q')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        try:
+            if exc_type is None:
+                self._keys.tofile(self._file)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+        if exc_type is None:
+            os.replace(self.path + '.tmp', self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Counts the states of a sliding puzzle at every depth.')
+    parser.add_argument('directory', help='the working directory, where an unfinished sweep is resumed')
+    parser.add_argument('--size', type=int, default=3, help='the width of the board (default: 3)')
+    parser.add_argument('--distances', action='store_true', help='write the distance table of all the states')
+    parser.add_argument('--max-depth', type=int, help='stop after the layer of this depth')
+    args = parser.parse_args()
+    for depth, count in enumerate(sweep(args.directory, args.size, distances=args.distances,
+                                        max_depth=args.max_depth)):
+        print(depth, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Counters and timings of search runs.
+
+Every search entry point accepts a `stats` argument (a SearchStats that is
+filled during the run) and an `on_expand` callback, called with each expanded
+node and the stats. When both are None (and there is no budget, see
+budget.py), the searches call the node methods and the queue operations
+directly, so the instrumentation costs nothing.
+"""
+import time
+from contextlib import contextmanager
+from functools import partial, wraps
+from operator import attrgetter, methodcaller
+
+from budget import BudgetExceeded
+
+
+class SearchStats:
+    """Counters and timings of one search run.
+
+    Attributes
+    ----------
+    generated : int
+        The number of child nodes generated.
+
+    expanded : int
+        The number of nodes whose children were generated.
+
+    duplicates : int
+        The number of generated nodes dropped because their state was already known.
+
+    max_frontier : int
+        The peak size of the frontier (open list), sampled at every expansion.
+
+    max_closed : int
+        The peak number of states in the closed/visited set, sampled at every expansion.
+
+    generate_time : float
+        Seconds spent in `generate_children` (or building the lazy successors),
+        including the heuristic of the children: it is evaluated by the node
+        constructor, out of reach of the searches, so it is not timed apart.
+
+    goal_time : float
+        Seconds spent in `is_goal`.
+
+    queue_time : float
+        Seconds spent pushing to and popping from the frontier.
+
+    total_time : float
+        Wall-clock seconds of the whole search.
+    """
+    FIELDS = ('generated', 'expanded', 'duplicates', 'max_frontier', 'max_closed',
+              'generate_time', 'goal_time', 'queue_time', 'total_time')
+
+    def __init__(self):
+        self.generated = 0
+        self.expanded = 0
+        self.duplicates = 0
+        self.max_frontier = 0
+        self.max_closed = 0
+        self.generate_time = 0.0
+        self.goal_time = 0.0
+        self.queue_time = 0.0
+        self.total_time = 0.0
+
+    def as_dict(self):
+        """Returns the counters and timings as a dict, e.g. to log them as JSON."""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self):
+        return 'SearchStats({})'.format(', '.join('{}={!r}'.format(k, v) for k, v in self.as_dict().items()))
+
+
+_is_goal = methodcaller('is_goal')
+_generate_children = methodcaller('generate_children')
+
+
+def successors(node):
+    """Returns the lazy successors of a node: `node.successors()` where the
+    problem class defines it, otherwise its children sorted by f.
+
+    Returns
+    -------
+        successors : iterator of (bound, build) pairs
+            The children in order of their lower bound on f, each with a
+            function that returns the child.
+    """
+    lazy = getattr(node, 'successors', None)
+    if lazy is not None:
+        return lazy()
+    return ((child.f, partial(prebuilt, child)) for child in sorted(node.generate_children(), key=_f))
+
+
+_f = attrgetter('f')
+
+
+def prebuilt(node):
+    """Returns `node`: `partial(prebuilt, node)` is the build function of a
+    successor that is already built (see `successors`).
+    """
+    return node
+
+
+class Probe:
+    """Hands the searches either the plain operations or timed versions of them.
+
+    Parameters
+    ----------
+    stats : SearchStats or None
+        The stats to fill. A new one is created if only `on_expand` is given.
+
+    on_expand : callable or None
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget : budget.SearchBudget or None
+        The limits of the search, checked at every expansion.
+
+    Attributes
+    ----------
+    stats : SearchStats or None
+        The stats being filled, None when the instrumentation is disabled.
+
+    exhausted : budget.BudgetExhausted or None
+        Set when the search was stopped by its budget.
+
+    Examples
+    --------
+    >>> probe = Probe(stats, on_expand)
+    >>> is_goal, expand, pop = probe.is_goal, probe.expand, probe.queue(fringe.popleft)
+    >>> with probe.running():
+    ...     node = pop()
+    ...     if not is_goal(node):
+    ...         children = expand(node)
+    ...     return None
+    >>> return probe.exhausted
+    """
+    def __init__(self, stats=None, on_expand=None, budget=None):
+        if stats is None and on_expand is not None:
+            stats = SearchStats()
+        self.stats = stats
+        self.on_expand = on_expand
+        self.budget = budget
+        self.exhausted = None
+        self._started = False
+        self._frontiers = ()
+        self._closed = ()
+
+    def watch(self, frontiers=(), closed=()):
+        """Sets the containers whose sizes are sampled for `max_frontier` and `max_closed`."""
+        self._frontiers = frontiers
+        self._closed = closed
+
+    @property
+    def is_goal(self):
+        """Function calling `node.is_goal()`."""
+        if self.stats is None:
+            return _is_goal
+        stats = self.stats
+
+        def is_goal(node):
+            start = time.perf_counter()
+            try:
+                return node.is_goal()
+            finally:
+                stats.goal_time += time.perf_counter() - start
+        return is_goal
+
+    @property
+    def expand(self):
+        """Function returning `node.generate_children()`. It raises
+        budget.BudgetExceeded when a limit of the budget is hit.
+        """
+        return self.expander()
+
+    def expander(self, observe=True):
+        """Same as `expand`. With `observe=False` the nodes are not candidates
+        for the best partial solution, e.g. in the backward half of a
+        bidirectional search.
+        """
+        expand = _generate_children if self.stats is None else self._timed_expand()
+        if self.budget is None:
+            return expand
+        budget = self.budget
+
+        def budgeted_expand(node):
+            if observe:
+                budget.observe(node)
+            budget.charge()
+            children = expand(node)
+            if observe:
+                for child in children:
+                    budget.observe(child)
+            return children
+        return budgeted_expand
+
+    @property
+    def successors(self):
+        """Function returning the lazy successors of a node, as (bound, build)
+        pairs (see `NpuzzleNode.successors`): the counterpart of `expand` for the
+        depth-first searches. The node counts as expanded when the function is
+        called, and a child as generated when it is built. It raises
+        budget.BudgetExceeded when a limit of the budget is hit.
+        """
+        if self.stats is None and self.budget is None:
+            return successors
+        stats, budget, on_expand = self.stats, self.budget, self.on_expand
+
+        def counted_successors(node):
+            if budget is not None:
+                budget.observe(node)
+                budget.charge()
+            if stats is not None:
+                self._sample()
+                stats.expanded += 1
+                if on_expand is not None:
+                    on_expand(node, stats)
+            return ((bound, partial(self._build, build)) for bound, build in successors(node))
+        return counted_successors
+
+    def _build(self, build):
+        if self.stats is None:
+            child = build()
+        else:
+            start = time.perf_counter()
+            child = build()
+            self.stats.generate_time += time.perf_counter() - start
+            self.stats.generated += 1
+        if self.budget is not None:
+            self.budget.observe(child)
+        return child
+
+    def _sample(self):
+        """Samples the sizes of the watched containers into `max_frontier` and `max_closed`."""
+        stats = self.stats
+        frontier = sum(len(f) for f in self._frontiers)
+        closed = sum(len(c) for c in self._closed)
+        if frontier > stats.max_frontier:
+            stats.max_frontier = frontier
+        if closed > stats.max_closed:
+            stats.max_closed = closed
+
+    def _timed_expand(self):
+        stats, on_expand = self.stats, self.on_expand
+
+        def expand(node):
+            self._sample()
+            start = time.perf_counter()
+            children = node.generate_children()
+            stats.generate_time += time.perf_counter() - start
+            stats.expanded += 1
+            stats.generated += len(children)
+            if on_expand is not None:
+                on_expand(node, stats)
+            return children
+        return expand
+
+    def queue(self, operation):
+        """Returns `operation`, a frontier push or pop, timed into `queue_time`."""
+        if self.stats is None:
+            return operation
+        stats = self.stats
+
+        @wraps(operation)
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return operation(*args)
+            finally:
+                stats.queue_time += time.perf_counter() - start
+        return timed
+
+    def duplicate(self):
+        """Counts a generated node dropped as a duplicate."""
+        if self.stats is not None:
+            self.stats.duplicates += 1
+
+    @contextmanager
+    def running(self):
+        """Context of the whole search: measures `total_time`. A
+        budget.BudgetExceeded raised in the context is turned into `exhausted`.
+        The budget is started when the context is entered for the first time, so
+        a search can run in several steps under one budget.
+        """
+        if self.budget is not None and not self._started:
+            self.budget.start()
+        self._started = True
+        try:
+            if self.stats is None:
+                yield
+                return
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.stats.total_time += time.perf_counter() - start
+        except BudgetExceeded as e:
+            self.exhausted = self.budget.exhausted(e.reason)
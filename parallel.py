@@ -0,0 +1,243 @@
+"""Hash-distributed parallel A* (HDA*) for a single instance.
+
+Every search state is owned by one worker process, chosen by hashing
+`node.state`. A worker keeps the open list and the best g of the states it
+owns, expands its best node and sends each child to the inbox of the child's
+owner. Nodes are sent without their parent chain: the owner of a state records
+the state of its parent instead, and the path is rebuilt at the end.
+
+As the workers do not expand the nodes in the global best-first order, a state
+can be reopened when a cheaper path to it arrives later. Once a goal of cost C
+has been found, the search is over when no worker has an open node with f < C
+and no message is in flight; with an admissible heuristic the goal found is
+then optimal, i.e. the path has the same cost as the one of the serial `Astar`.
+
+The states are hashed with `hash`, which is the same in every process for the
+ints and tuples of ints used by the problems of this package.
+"""
+import heapq
+import multiprocessing
+import queue
+import time
+from itertools import count
+from math import inf
+
+from budget import BudgetExceeded
+from node import Node
+from search import _child_with_state
+
+# Seconds a worker without open work waits for a message before checking for the stop signal again.
+_IDLE_WAIT = 0.005
+
+# Nodes a worker expands between two polls of its inbox.
+_BATCH = 64
+
+
+def HDAstar(root: Node, processes=None, stats=None, budget=None):
+    """Runs the A* algorithm given the root node on several worker processes.
+    The algorithm either returns the solution as a path from the start node to
+    the goal node or returns None if there's no solution.
+
+    Parameters
+    ----------
+    root: Node
+        The start node of the problem to be solved.
+
+    processes: int, optional
+        The number of worker processes. Default is the number of CPUs.
+
+    stats: SearchStats, optional
+        Filled with the counters of all the workers and the total time of the run.
+        The peak sizes are the sums of the peaks of the workers, and the
+        per-operation timings are not measured.
+
+    budget: SearchBudget, optional
+        The limits of the run. The expansions of all the workers are counted,
+        the memory limit is not enforced and the outcome has no best node.
+
+    Returns
+    -------
+        path: list of Nodes or None
+            The solution, a path from the initial node to the goal node.
+            If there is no solution it should return None, and if the budget
+            runs out it returns a BudgetExhausted.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    inboxes = [multiprocessing.Queue() for _ in range(processes)]
+    replies = multiprocessing.Queue()
+    incumbent = multiprocessing.Value('d', inf)
+    goal_owner = multiprocessing.Value('i', -1, lock=False)
+    # Each slot is written by its own worker only, so no locks are needed.
+    sent = multiprocessing.Array('q', processes, lock=False)
+    received = multiprocessing.Array('q', processes, lock=False)
+    idle = multiprocessing.Array('b', processes, lock=False)
+    expanded = multiprocessing.Array('q', processes, lock=False)
+    stop = multiprocessing.Event()
+
+    workers = [multiprocessing.Process(
+        target=_worker,
+        args=(index, inboxes, replies, incumbent, goal_owner, sent, received, idle, expanded, stop),
+        daemon=True) for index in range(processes)]
+    for worker in workers:
+        worker.start()
+    start = time.perf_counter()
+    if budget is not None:
+        budget.start()
+    try:
+        inboxes[hash(root.state) % processes].put(('nodes', [(root, None)]))
+        try:
+            _wait_for_termination(workers, sent, received, idle, 1, budget, expanded)
+        except BudgetExceeded as e:
+            return budget.exhausted(e.reason)
+        if stats is not None:
+            _collect_stats(stats, inboxes, replies)
+        if incumbent.value == inf:
+            return None
+        return _rebuild_path(root, inboxes, replies, goal_owner.value)
+    finally:
+        stop.set()
+        for inbox in inboxes:
+            inbox.put(('stop',))
+        for worker in workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+        if stats is not None:
+            stats.total_time += time.perf_counter() - start
+
+
+def _wait_for_termination(workers, sent, received, idle, initial_messages, budget=None, expanded=None):
+    """Waits until every worker is idle and every message has been received,
+    as seen by two consecutive scans that read the same counters.
+    Raises BudgetExceeded if the budget runs out first.
+    """
+    previous = None
+    while True:
+        if not all(worker.is_alive() for worker in workers):
+            raise RuntimeError('an HDA* worker process died')
+        if budget is not None:
+            budget.expansions = sum(expanded)
+            budget.check(memory=False)
+        scan = None
+        if all(idle):
+            total_received = sum(received)
+            total_sent = sum(sent) + initial_messages
+            if total_sent == total_received and all(idle):
+                scan = total_sent
+        if scan is not None and scan == previous:
+            return
+        previous = scan
+        time.sleep(0.001)
+
+
+def _collect_stats(stats, inboxes, replies):
+    """Adds up the counters of the workers into `stats`."""
+    for inbox in inboxes:
+        inbox.put(('stats',))
+    for _ in inboxes:
+        counters = replies.get()
+        for field, value in counters.items():
+            setattr(stats, field, getattr(stats, field) + value)
+
+
+def _rebuild_path(root, inboxes, replies, goal_owner):
+    """Asks the owners for the parent of each state, from the goal back to the
+    root, and replays those states from the root to build the list of nodes.
+    """
+    processes = len(inboxes)
+    inboxes[goal_owner].put(('goal',))
+    state = replies.get()
+    states = [state]
+    while True:
+        inboxes[hash(state) % processes].put(('parent', state))
+        state = replies.get()
+        if state is None:
+            break
+        states.append(state)
+    path = [root]
+    for state in reversed(states[:-1]):
+        path.append(_child_with_state(path[-1], state))
+    return path
+
+
+def _worker(index, inboxes, replies, incumbent, goal_owner, sent, received, idle, expanded, stop):
+    processes = len(inboxes)
+    inbox = inboxes[index]
+    counter = count()
+    fringe = []
+    best_g = {}
+    parents = {}
+    goal_state = None
+    counters = {'generated': 0, 'expanded': 0, 'duplicates': 0, 'max_frontier': 0, 'max_closed': 0}
+
+    def offer(node, parent_state):
+        state = node.state
+        if node.g >= best_g.get(state, inf):
+            counters['duplicates'] += 1
+            return
+        best_g[state] = node.g
+        parents[state] = parent_state
+        heapq.heappush(fringe, (node.f, node.f - node.g, next(counter), node))
+
+    while not stop.is_set():
+        # Drop stale entries and the nodes that cannot beat the incumbent goal.
+        bound = incumbent.value
+        while fringe and (fringe[0][0] >= bound or fringe[0][3].g > best_g[fringe[0][3].state]):
+            heapq.heappop(fringe)
+        if not fringe:
+            idle[index] = 1
+
+        # Receive: wait for a message when idle, otherwise take what is already there.
+        while True:
+            try:
+                message = inbox.get(timeout=_IDLE_WAIT) if not fringe else inbox.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == 'nodes':
+                idle[index] = 0
+                for node, parent_state in message[1]:
+                    offer(node, parent_state)
+                received[index] += 1
+            elif kind == 'parent':
+                replies.put(parents[message[1]])
+            elif kind == 'goal':
+                replies.put(goal_state)
+            elif kind == 'stats':
+                replies.put(counters)
+            elif kind == 'stop':
+                return
+
+        # Expand a batch of nodes before polling the inbox again.
+        outgoing = {}
+        for _ in range(_BATCH):
+            if not fringe or fringe[0][0] >= bound:
+                break
+            node = heapq.heappop(fringe)[3]
+            if node.g > best_g[node.state]:
+                continue
+            if node.is_goal():
+                with incumbent.get_lock():
+                    if node.g < incumbent.value:
+                        incumbent.value = node.g
+                        goal_owner.value = index
+                        goal_state = node.state
+                bound = incumbent.value
+                continue
+            children = node.generate_children()
+            counters['expanded'] += 1
+            counters['generated'] += len(children)
+            counters['max_frontier'] = max(counters['max_frontier'], len(fringe))
+            counters['max_closed'] = max(counters['max_closed'], len(best_g))
+            for child in children:
+                owner = hash(child.state) % processes
+                if owner == index:
+                    offer(child, node.state)
+                else:
+                    child.parent = None
+                    outgoing.setdefault(owner, []).append((child, node.state))
+        expanded[index] = counters['expanded']
+        # A message is counted as sent before it is put, so it is never missed by the termination check.
+        for owner, children in outgoing.items():
+            sent[index] += 1
+            inboxes[owner].put(('nodes', children))
@@ -0,0 +1,246 @@
+"""Additive disjoint pattern databases for the NpuzzleNode.
+
+The tiles are split into disjoint groups (a partition such as 5-5-5 or 6-6-3).
+For every group, a table stores the minimum number of moves of the group's own
+tiles needed to bring them home from any placement, ignoring all other tiles.
+Moves of the other tiles are free, so the tables of disjoint groups can be
+added together and the sum is still an admissible heuristic.
+
+The tables are built once by a backward breadth-first search from the goal
+and written to a compact binary file, which `load` memory-maps: several worker
+processes that load the same file share one copy of the tables.
+
+Example
+-------
+Build the tables once (offline)::
+
+    $ python pattern_db.py 15puzzle.pdb --size 4
+
+and use them as the heuristic of a node class::
+
+    >>> class PdbNpuzzleNode(NpuzzleNode):
+    ...     pattern_db = pattern_db.load('15puzzle.pdb')
+    >>> path = Astar(PdbNpuzzleNode(input_str=initial_state_str))
+"""
+import argparse
+import mmap
+import struct
+from collections import deque
+
+MAGIC = b'NPDB'
+VERSION = 1
+
+DEFAULT_PARTITIONS = {
+    3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+    4: ((1, 2, 3, 5, 6), (4, 7, 8, 11, 12), (9, 10, 13, 14, 15)),
+}
+
+_UNSEEN = 0xff
+
+
+class PatternDatabase:
+    """A set of additive pattern tables backed by a memory-mapped file.
+
+    Parameters
+    ----------
+    size : int
+        The width of the board.
+
+    partition : tuple of tuples of int
+        The disjoint tile groups, one table per group.
+
+    tables : list of buffers
+        For each group, one byte per placement of its tiles. The placement where
+        tile `partition[g][i]` is on cell `p_i` is stored at index sum(p_i * cells**i).
+
+    Attributes
+    ----------
+    size : int
+        The width of the board.
+
+    partition : tuple of tuples of int
+        The disjoint tile groups, one table per group.
+    """
+    def __init__(self, size, partition, tables, mapping=None):
+        self.size = size
+        self.partition = partition
+        self._tables = tables
+        self._weights = [[(size * size) ** i for i in range(len(tiles))] for tiles in partition]
+        self._mapping = mapping
+
+    def evaluate(self, cells):
+        """Sums the table values of every tile group.
+
+        Parameters
+        ----------
+        cells : sequence of int
+            The tile on each cell, row by row (e.g. `node.state` of an NpuzzleNode).
+
+        Returns
+        -------
+            h : int
+                The additive pattern database heuristic.
+        """
+        position = [0] * len(cells)
+        for cell, tile in enumerate(cells):
+            position[tile] = cell
+        h = 0
+        for tiles, weights, table in zip(self.partition, self._weights, self._tables):
+            h += table[sum(position[tile] * w for tile, w in zip(tiles, weights))]
+        return h
+
+    def close(self):
+        """Releases the memory map, if the tables were loaded from a file."""
+        if self._mapping is not None:
+            self._tables = []
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def build(path, size=4, partition=None):
+    """Builds the pattern tables of a puzzle and writes them to `path`.
+
+    Building a group of k tiles visits every placement of the k tiles and the
+    empty cell, (size**2)**(k+1) table slots, so groups of 6 or more tiles on
+    the 4x4 board take a long time and a lot of memory in pure Python.
+
+    Parameters
+    ----------
+    path : str
+        The output file.
+
+    size : int, optional
+        The width of the board. Default is 4.
+
+    partition : tuple of tuples of int, optional
+        The disjoint tile groups. Default is `DEFAULT_PARTITIONS[size]`.
+
+    Returns
+    -------
+        pattern_db : PatternDatabase
+            The in-memory tables that were written.
+    """
+    if partition is None:
+        partition = DEFAULT_PARTITIONS[size]
+    partition = tuple(tuple(tiles) for tiles in partition)
+    _check_partition(size, partition)
+    tables = [_build_table(size, tiles) for tiles in partition]
+    with open(path, 'wb') as f:
+        f.write(_header(size, partition))
+        for table in tables:
+            f.write(table)
+    return PatternDatabase(size, partition, tables)
+
+
+def load(path):
+    """Memory-maps a pattern database file written by `build`.
+
+    Parameters
+    ----------
+    path : str
+        The file written by `build`.
+
+    Returns
+    -------
+        pattern_db : PatternDatabase
+            The tables, backed by a read-only memory map of the file.
+    """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, size, groups = struct.unpack_from('<4sBBB', mapping)
+    if magic != MAGIC or version != VERSION:
+        mapping.close()
+        raise ValueError('{} is not a pattern database file'.format(path))
+    offset = 7
+    partition = []
+    for _ in range(groups):
+        k = mapping[offset]
+        partition.append(tuple(mapping[offset + 1:offset + 1 + k]))
+        offset += 1 + k
+    view = memoryview(mapping)
+    tables = []
+    for tiles in partition:
+        length = (size * size) ** len(tiles)
+        tables.append(view[offset:offset + length])
+        offset += length
+    return PatternDatabase(size, tuple(partition), tables, mapping)
+
+
+def _header(size, partition):
+    header = struct.pack('<4sBBB', MAGIC, VERSION, size, len(partition))
+    for tiles in partition:
+        header += bytes((len(tiles),) + tiles)
+    return header
+
+
+def _check_partition(size, partition):
+    seen = set()
+    for tiles in partition:
+        for tile in tiles:
+            if not 0 < tile < size * size or tile in seen:
+                raise ValueError('the tile groups must be disjoint sets of tiles 1..{}'.format(size * size - 1))
+            seen.add(tile)
+
+
+def _build_table(size, tiles):
+    """0-1 breadth-first search backwards from the goal over the placements of
+    `tiles` and the empty cell. Moving a tile of the group costs one, moving any
+    other tile (the empty cell into a cell not held by the group) costs zero.
+    """
+    cells = size * size
+    k = len(tiles)
+    weights = [cells ** i for i in range(k + 1)]
+    neighbours = [[r * size + c for r, c in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1))
+                   if 0 <= r < size and 0 <= c < size]
+                  for i, j in (divmod(cell, size) for cell in range(cells))]
+
+    table = bytearray([_UNSEEN]) * weights[k]
+    dist = bytearray([_UNSEEN]) * (weights[k] * cells)
+    start = (tuple(tile - 1 for tile in tiles), cells - 1)
+    dist[sum(p * w for p, w in zip(start[0], weights)) + start[1] * weights[k]] = 0
+    queue = deque([(start, 0)])
+    while queue:
+        (positions, blank), d = queue.popleft()
+        index = sum(p * w for p, w in zip(positions, weights))
+        if dist[index + blank * weights[k]] < d:
+            continue
+        if table[index] == _UNSEEN:
+            table[index] = d
+        for cell in neighbours[blank]:
+            if cell in positions:
+                i = positions.index(cell)
+                moved = positions[:i] + (blank,) + positions[i + 1:]
+                moved_index = index + (blank - cell) * weights[i]
+                cost = d + 1
+            else:
+                moved, moved_index, cost = positions, index, d
+            key = moved_index + cell * weights[k]
+            if cost < dist[key]:
+                dist[key] = cost
+                if cost == d:
+                    queue.appendleft(((moved, cell), cost))
+                else:
+                    queue.append(((moved, cell), cost))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the additive pattern database of a sliding puzzle.')
+    parser.add_argument('path', help='the output file')
+    parser.add_argument('--size', type=int, default=4, help='the width of the board (default: 4)')
+    parser.add_argument('--partition', help='tile groups, e.g. "1,2,3,5,6/4,7,8,11,12/9,10,13,14,15"')
+    args = parser.parse_args()
+    partition = None
+    if args.partition:
+        partition = [tuple(int(t) for t in group.split(',')) for group in args.partition.split('/')]
+    build(args.path, args.size, partition)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,48 @@
 from node import Node
 from copy import deepcopy
+from functools import lru_cache, partial
+from math import inf
+from operator import attrgetter, itemgetter
+
+from instrumentation import prebuilt
+
+
+def _own_heuristic(node, node_class):
+    """True if `node` evaluates the heuristic of `node_class`, i.e. its class does
+    not override it, so the incremental updates of `node_class` are valid for it.
+    The subclasses with `overlays_heuristic = True` (see cache.py) count as their
+    base class: their heuristic only differs on states that are never expanded.
+    """
+    cls = type(node)
+    while cls.__dict__.get('overlays_heuristic', False):
+        cls = cls.__base__
+    return cls.evaluate_heuristic is node_class.evaluate_heuristic
+
+@lru_cache(maxsize=None)
+def _goal_state(size):
+    """Returns the state of the solved size x size puzzle: tiles in order, empty cell last."""
+    return tuple(range(1, size * size)) + (0,)
+
+@lru_cache(maxsize=64)
+def _tile_cells(state, size):
+    """Maps every tile of a puzzle state to its (row, column) cell."""
+    return {tile: divmod(k, size) for k, tile in enumerate(state)}
+
+@lru_cache(maxsize=None)
+def _transposition(size):
+    """The symmetry of the puzzle about the main diagonal: (source cell of every
+    cell, new label of every tile). The tiles are renamed so that the goal
+    configuration maps onto itself, hence a board and its transpose are the
+    same number of moves away from the goal.
+    """
+    cells = tuple(j * size + i for i in range(size) for j in range(size))
+    labels = (0,) + tuple(cells[tile - 1] + 1 for tile in range(1, size * size))
+    return cells, labels
+
+def _transpose(cells, size):
+    """Applies `_transposition` to the tiles of a board given row by row."""
+    source, labels = _transposition(size)
+    return tuple([labels[cells[k]] for k in source])
 
 class NpuzzleNode(Node):
     """Extends the Node class to solve the 15 puzzle.
@@ -43,6 +86,16 @@ class NpuzzleNode(Node):
 
     """
 
+    # Optional pattern_db.PatternDatabase (or external_bfs.DistanceTable) used by
+    # evaluate_heuristic instead of the Manhattan distance. Set it on a subclass
+    # to use it for a whole search.
+    pattern_db = None
+
+    # Cell of the empty tile and heuristic value, carried over from the parent
+    # by generate_children. None when they have to be computed from the board.
+    _blank = None
+    _h = None
+
     def __init__(self, parent=None, g=0, board=None, input_str=None):
         # NOTE: You shouldn't modify the constructor
         
@@ -65,29 +118,103 @@ class NpuzzleNode(Node):
         """
         children = []
         directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        x, y = None, None
-
-        for i in range(len(self.board)):
-            for j in range(len(self.board[i])):
-                if self.board[i][j] == 0:
-                    x, y = i, j
-                    break
-            if x is not None:
-                break
+        board = self.board
+        size = len(board)
+        x, y = self._blank_cell()
+        # A move changes the cell of one tile only, so the child's Manhattan
+        # distance is the parent's one plus or minus 1 for that tile.
+        incremental = self.pattern_db is None and _own_heuristic(self, NpuzzleNode)
+        h = self.f - self.g
 
         for dx, dy in directions:
             new_x, new_y = x + dx, y + dy
-            if 0 <= new_x < len(self.board) and 0 <= new_y < len(self.board[new_x]):
-                new_board = deepcopy(self.board)
-                new_board[x][y], new_board[new_x][new_y] = new_board[new_x][new_y], new_board[x][y]
-                child = NpuzzleNode(parent=self, g=self.g + 1, board=new_board)
-                children.append(child)
+            if 0 <= new_x < size and 0 <= new_y < size:
+                child_h = None
+                if incremental:
+                    goal_x, goal_y = divmod(board[new_x][new_y] - 1, size)
+                    child_h = (h + abs(x - goal_x) + abs(y - goal_y)
+                               - abs(new_x - goal_x) - abs(new_y - goal_y))
+                children.append(self._move_blank(new_x, new_y, child_h))
         return children
         # TODO: add your code here
         # You should use self.board to produce children. Don't forget to create a new board for each child
         # e.g you can use copy.deepcopy function from the standard library.
         # pass
 
+    def successors(self):
+        """Generates the children lazily, for the depth-first searches.
+
+        The move that brings the empty cell back to its cell in the parent (whose
+        child would be the grandparent) is skipped, and the other moves come in
+        order of the heuristic value of their child. A child is only built when
+        the search calls its function.
+
+        Yields
+        ------
+            (bound, build) : (int or float, callable)
+                The f of the child, never smaller than the bound before it, and
+                a function building the child.
+        """
+        board = self.board
+        size = len(board)
+        x, y = self._blank_cell()
+        back = self.parent._blank_cell() if isinstance(self.parent, NpuzzleNode) else None
+        if self.pattern_db is not None or not _own_heuristic(self, NpuzzleNode):
+            # The f of a child is only known once it is built.
+            children = sorted((child for child in self.generate_children() if child._blank != back),
+                              key=attrgetter('f'))
+            for child in children:
+                yield child.f, partial(prebuilt, child)
+            return
+        h = self.f - self.g
+        moves = []
+        for new_x, new_y in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if 0 <= new_x < size and 0 <= new_y < size and (new_x, new_y) != back:
+                goal_x, goal_y = divmod(board[new_x][new_y] - 1, size)
+                moves.append((h + abs(x - goal_x) + abs(y - goal_y) - abs(new_x - goal_x) - abs(new_y - goal_y),
+                              new_x, new_y))
+        moves.sort(key=itemgetter(0))
+        g = self.g + 1
+        for child_h, new_x, new_y in moves:
+            yield g + child_h, partial(self._move_blank, new_x, new_y, child_h)
+
+    def _move_blank(self, new_x, new_y, h):
+        """Builds the child where the empty cell moved to (new_x, new_y), with
+        the heuristic value `h` (None to compute it).
+        """
+        board = self.board
+        x, y = self._blank_cell()
+        # Only the rows that change are copied, the others are shared with the parent.
+        new_board = list(board)
+        new_board[x] = list(board[x])
+        if new_x != x:
+            new_board[new_x] = list(board[new_x])
+        new_board[x][y], new_board[new_x][new_y] = board[new_x][new_y], 0
+        return self._make_child(new_board, (new_x, new_y), h)
+
+    def _blank_cell(self):
+        """Returns the (row, column) of the empty cell, scanning the board only if it is not known yet."""
+        if self._blank is None:
+            for i, row in enumerate(self.board):
+                if 0 in row:
+                    self._blank = (i, row.index(0))
+                    break
+        return self._blank
+
+    def _make_child(self, board, blank, h):
+        """Builds a child one move away from this node.
+
+        Equivalent to `type(self)(parent=self, g=self.g+1, board=board)`, but the
+        blank cell and the heuristic value (if not None) are known in advance and
+        are not computed again.
+        """
+        child = type(self).__new__(type(self))
+        child.board = board
+        child._blank = blank
+        child._h = h
+        Node.__init__(child, self, self.g + 1)
+        return child
+
     def is_goal(self):
         """Decides whether this search state is the final state of the puzzle.
 
@@ -96,24 +223,54 @@ class NpuzzleNode(Node):
             is_goal : bool
                 True if this search state is the goal state, False otherwise.
         """
-        # n = 1
-        # for i in range(len(self.board)):
-        #     for j in range(len(self.board[i])):
-        #         if self.board[i][j] != n:
-        #             if i != len(self.board)-1 or j != len(self.board[i])-1:
-        #                 return False
-        #         n += 1
-
-        goal = [
-            [1, 2, 3, 4],
-            [5, 6, 7, 8],
-            [9, 10, 11, 12],
-            [13, 14, 15, 0]
-        ]
-        return self.board == goal
-        # TODO: add your code here
-        # You should use self.board to decide.
-        # pass
+        return self.state == _goal_state(len(self.board))
+
+    @classmethod
+    def goal_node(cls, size=4):
+        """Builds the root node of the goal configuration, e.g. to search backwards from the goal.
+
+        Parameters
+        ----------
+        size : int, optional
+            The width of the board. Default is 4.
+
+        Returns
+        -------
+            goal : NpuzzleNode
+                The node of the solved size x size board, of the class the
+                method is called on.
+        """
+        goal = _goal_state(size)
+        return cls(board=[list(goal[i:i + size]) for i in range(0, size * size, size)])
+
+    @property
+    def size(self):
+        """int: The width of the board."""
+        return len(self.board)
+
+    def heuristic_to(self, state):
+        """Manhattan distance from this board to the board of another search state.
+        This is the heuristic of a search whose target is not the goal configuration,
+        e.g. the backward half of a bidirectional search.
+
+        Parameters
+        ----------
+        state : tuple
+            The target search state, as returned by `_get_state`.
+
+        Returns
+        -------
+            h : int
+                The sum of the Manhattan distances of the tiles to their target cells.
+        """
+        target = _tile_cells(state, len(self.board))
+        h = 0
+        for i, row in enumerate(self.board):
+            for j, tile in enumerate(row):
+                if tile != 0:
+                    goal_x, goal_y = target[tile]
+                    h += abs(i - goal_x) + abs(j - goal_y)
+        return h
 
     def evaluate_heuristic(self):
         """Heuristic function h(n) that estimates the minimum number of moves
@@ -124,6 +281,13 @@ class NpuzzleNode(Node):
             h : int or float
                 The heuristic value for this state.
         """
+        if self._h is not None:
+            return self._h
+        if self.pattern_db is not None:
+            # The transposed board is as far from the goal, so its lookup is also a
+            # lower bound; the max of both is stronger and the same for both boards.
+            cells = [n for row in self.board for n in row]
+            return max(self.pattern_db.evaluate(cells), self.pattern_db.evaluate(_transpose(cells, len(self.board))))
         h = 0
         size = len(self.board)
         for i in range(size):
@@ -136,6 +300,20 @@ class NpuzzleNode(Node):
         # TODO: add your code here
         # You may want to use self.board here.
         # pass
+
+    def canonical_state(self):
+        """Returns the same key for this state and for its transpose (see
+        `_transposition`), which are as far from the goal. The searches use it
+        for duplicate detection when they run with `symmetry=True`.
+
+        Returns
+        -------
+            key: tuple
+                The smaller of the state and of the state of the transposed board.
+        """
+        state = self.state
+        return min(state, _transpose(state, len(self.board)))
+
     def _get_state(self):
         """Returns an hashable representation of this search state.
 
@@ -172,6 +350,250 @@ class NpuzzleNode(Node):
     def __lt__(self, other):
         return self.f < other.f
 
+class PackedNpuzzleNode:
+    """Compact alternative to NpuzzleNode for boards of up to 4x4.
+
+    The whole board is packed into a single integer with 4 bits per cell (the
+    tile on cell k is stored in bits 4k..4k+3), which is also the search state.
+    Moves are a few bit operations, the goal test is one integer comparison,
+    and the states hash faster into closed sets.
+
+    The instances have `__slots__` and no `__dict__`. Node itself has no slots,
+    so this class does not inherit from it: it is registered as a virtual
+    subclass and calls the methods of Node directly. A node then takes about
+    a quarter of the memory of an NpuzzleNode (some 130 against 580 bytes per
+    15-puzzle node, measured with tracemalloc), which is short of an order of
+    magnitude: the object with its eight slots and the 64-bit packed int
+    already take over 100 bytes.
+
+    Parameters
+    ----------
+    parent : Node, optional
+        The parent node. Default is None.
+
+    g : int or float, optional
+        The number of moves to reach this node from the initial configuration. Default is 0.
+
+    board : list of lists
+        The two-dimensional list that describes the state.
+        It is optional only if the input_str is provided. Default is None.
+
+    input_str : str
+        The input string to be parsed to create the board, as for NpuzzleNode.
+        The argument 'board' will be ignored, if input_str is provided.
+
+    Attributes
+    ----------
+    size : int
+        The width of the board.
+
+    blank : int
+        The index of the empty cell, row by row.
+
+    h : int or None
+        The Manhattan distance heuristic of this state, None in the subclasses
+        that override `evaluate_heuristic`.
+
+    Examples
+    ----------
+    >>> n = PackedNpuzzleNode(input_str='1 2 3 4\n5 6 7 8\n9 10 0 11\n13 14 15 12')
+    >>> n.state == PackedNpuzzleNode.goal_node().state
+    False
+    >>> Astar(n)[-1].is_goal()
+    True
+
+    """
+    __slots__ = ('parent', 'g', 'f', 'state', 'size', 'blank', 'h', '_packed')
+
+    def __init__(self, parent=None, g=0, board=None, input_str=None):
+        if input_str:
+            board = [[int(n) for n in line.split()] for line in filter(None, input_str.splitlines())]
+        size = len(board)
+        if size * size > 16:
+            raise ValueError('PackedNpuzzleNode supports boards of up to 4x4, got {0}x{0}'.format(size))
+        cells = [n for row in board for n in row]
+        self.size = size
+        self.blank = cells.index(0)
+        self.h = None
+        self._packed = _pack(cells)
+        Node.__init__(self, parent, g)
+
+    goal_node = classmethod(NpuzzleNode.goal_node.__func__)
+
+    @property
+    def board(self):
+        """list of lists: The board unpacked into rows, as in NpuzzleNode."""
+        cells = _unpack(self._packed, self.size * self.size)
+        return [cells[i:i + self.size] for i in range(0, len(cells), self.size)]
+
+    def generate_children(self):
+        """Generates children by trying all 4 possible moves of the empty cell.
+
+        Returns
+        -------
+            children : list of Nodes
+                The list of child nodes.
+        """
+        blank = self.blank
+        make_child = self._make_child
+        moves = _packed_moves(self._packed, blank, self.size)
+        if not _own_heuristic(self, PackedNpuzzleNode):
+            # `h` is only kept up to date by the Manhattan distance of this class.
+            return [make_child(packed, cell, None) for packed, cell, _ in moves]
+        distance = _manhattan_table(self.size)
+        return [make_child(packed, cell, self.h + distance[tile][blank] - distance[tile][cell])
+                for packed, cell, tile in moves]
+
+    def successors(self):
+        """Same as `NpuzzleNode.successors`, for the packed boards.
+
+        Yields
+        ------
+            (bound, build) : (int or float, callable)
+                The f of the child, never smaller than the bound before it, and
+                a function building the child.
+        """
+        back = self.parent.blank if isinstance(self.parent, PackedNpuzzleNode) else None
+        if not _own_heuristic(self, PackedNpuzzleNode):
+            children = sorted((child for child in self.generate_children() if child.blank != back),
+                              key=attrgetter('f'))
+            for child in children:
+                yield child.f, partial(prebuilt, child)
+            return
+        distance = _manhattan_table(self.size)
+        blank = self.blank
+        moves = sorted(((self.h + distance[tile][blank] - distance[tile][cell], packed, cell)
+                        for packed, cell, tile in _packed_moves(self._packed, blank, self.size) if cell != back),
+                       key=itemgetter(0))
+        g = self.g + 1
+        for child_h, packed, cell in moves:
+            yield g + child_h, partial(self._make_child, packed, cell, child_h)
+
+    def _make_child(self, packed, blank, h):
+        """Builds a child one move away from this node, with its packed board,
+        empty cell and heuristic value.
+        """
+        node_class = type(self)
+        child = node_class.__new__(node_class)
+        child.size = self.size
+        child.blank = blank
+        child.h = h
+        child._packed = packed
+        Node.__init__(child, self, self.g + 1)
+        return child
+
+    def is_goal(self):
+        """Decides whether this search state is the final state of the puzzle.
+
+        Returns
+        -------
+            is_goal : bool
+                True if this search state is the goal state, False otherwise.
+        """
+        return self._packed == _packed_goal(self.size)
+
+    def evaluate_heuristic(self):
+        """Manhattan distance of the tiles to their goal cells.
+
+        Returns
+        -------
+            h : int
+                The heuristic value for this state.
+        """
+        if self.h is None:
+            distance = _manhattan_table(self.size)
+            cells = _unpack(self._packed, self.size * self.size)
+            self.h = sum(distance[tile][cell] for cell, tile in enumerate(cells))
+        return self.h
+
+    def heuristic_to(self, state):
+        """Manhattan distance from this board to the board of another (packed) search state.
+
+        Parameters
+        ----------
+        state : int
+            The target search state, as returned by `_get_state`.
+
+        Returns
+        -------
+            h : int
+                The sum of the Manhattan distances of the tiles to their target cells.
+        """
+        n_cells = self.size * self.size
+        target = _unpack(state, n_cells)
+        return NpuzzleNode.heuristic_to(self, tuple(target))
+
+    def canonical_state(self):
+        """Same as `NpuzzleNode.canonical_state`, for the packed state.
+
+        Returns
+        -------
+            key: int
+                The smaller of the packed state and of the packed transposed board.
+        """
+        n_cells = self.size * self.size
+        return min(self._packed, _pack(_transpose(_unpack(self._packed, n_cells), self.size)))
+
+    def _get_state(self):
+        """Returns the packed board, which is the hashable representation of this search state.
+
+        Returns
+        -------
+            state: int
+                The hashable representation of the search state
+        """
+        return self._packed
+
+    get_path = Node.get_path
+
+    __str__ = NpuzzleNode.__str__
+
+    def __lt__(self, other):
+        return self.f < other.f
+
+Node.register(PackedNpuzzleNode)
+
+def _pack(cells):
+    """Packs the tiles of a board, row by row, into an integer with 4 bits per cell."""
+    packed = 0
+    for k, tile in enumerate(cells):
+        packed |= tile << (4 * k)
+    return packed
+
+@lru_cache(maxsize=None)
+def _packed_goal(size):
+    """Returns the packed state of the solved size x size puzzle."""
+    return _pack(_goal_state(size))
+
+def _unpack(packed, n_cells):
+    """Inverse of `_pack`: the list of the tiles on each cell."""
+    return [(packed >> (4 * k)) & 15 for k in range(n_cells)]
+
+@lru_cache(maxsize=None)
+def _neighbour_cells(size):
+    """For each cell of a size x size board, the cells one move away."""
+    return tuple(
+        tuple(r * size + c for r, c in ((i, j + 1), (i, j - 1), (i + 1, j), (i - 1, j))
+              if 0 <= r < size and 0 <= c < size)
+        for i, j in (divmod(cell, size) for cell in range(size * size)))
+
+@lru_cache(maxsize=None)
+def _manhattan_table(size):
+    """distance[tile][cell]: Manhattan distance from a cell to the goal cell of a tile (0 for the empty tile)."""
+    distance = [[0] * (size * size)]
+    for tile in range(1, size * size):
+        goal_x, goal_y = divmod(tile - 1, size)
+        distance.append([abs(i - goal_x) + abs(j - goal_y)
+                         for i, j in (divmod(cell, size) for cell in range(size * size))])
+    return distance
+
+def _packed_moves(packed, blank, size):
+    """Yields (child_packed, child_blank, moved_tile) for every move of the empty cell of a packed board."""
+    for cell in _neighbour_cells(size)[blank]:
+        tile = (packed >> (4 * cell)) & 15
+        # The empty cell holds 0, so the tile just has to be moved to its bits.
+        yield packed ^ (tile << (4 * cell)) | (tile << (4 * blank)), cell, tile
+
 class NqueensNode(Node):
     """Extends the Node class to solve the Superqueens problem.
 
@@ -218,6 +640,19 @@ class NqueensNode(Node):
 
     """
 
+    # Occupancy of the board: a bitmask of the columns taken and the number of
+    # queens on every diagonal (indexed by row - column + n - 1) and
+    # anti-diagonal (row + column). The column mask of a child is set by
+    # generate_children, and the diagonal counts of its parent are kept in
+    # _parent_counts until the child needs its own. The heuristic of this class
+    # needs them, so they are built as soon as the child is constructed; they
+    # are only shared until the expansion in the subclasses with another
+    # heuristic (e.g. the blind queens of benchmark.py).
+    _columns = None
+    _diagonals = None
+    _anti_diagonals = None
+    _parent_counts = None
+
     def __init__(self, parent=None, g=0, queen_positions=[], n=1):
         # NOTE: You shouldn't modify the constructor
         self.queen_positions = queen_positions
@@ -225,23 +660,66 @@ class NqueensNode(Node):
         super(NqueensNode, self).__init__(parent, g)
     
     def addable(self, new_queen_pos):
-        queens = self.queen_positions
-        for queen in queens:
-            if queen[1] == new_queen_pos[1]:
-                return False
-        return True
+        return not self._occupancy()[0] >> new_queen_pos[1] & 1
     
     def conflict_count(self, new_queen):
         queens = self.queen_positions
-        count = 0
-
         [x, y] = new_queen
-        for queen in queens:
-            [i, j] = queen
-            if (abs(x-i) == abs(y-j)) or abs(x-i) + abs(y-j) == 3:
-                count += 1
+        if x != len(queens):
+            count = 0
+            for queen in queens:
+                [i, j] = queen
+                if (abs(x-i) == abs(y-j)) or abs(x-i) + abs(y-j) == 3:
+                    count += 1
+            return count
+        # A queen on the next row: the queens on its diagonals, plus the ones a
+        # knight's move away or three rows up in the same column.
+        _, diagonals, anti_diagonals = self._occupancy()
+        count = diagonals[x - y + self.n - 1] + anti_diagonals[x + y]
+        if x >= 1 and abs(queens[x - 1][1] - y) == 2:
+            count += 1
+        if x >= 2 and abs(queens[x - 2][1] - y) == 1:
+            count += 1
+        if x >= 3 and queens[x - 3][1] == y:
+            count += 1
         return count
 
+    def _occupancy(self):
+        """Returns (column mask, diagonal counts, anti-diagonal counts), building
+        the counts from the ones of the parent, or from the queens if unknown.
+        """
+        if self._diagonals is None:
+            n = self.n
+            if self._parent_counts is not None:
+                diagonals, anti_diagonals = list(self._parent_counts[0]), list(self._parent_counts[1])
+                queens = self.queen_positions[-1:]
+                self._parent_counts = None
+            else:
+                diagonals, anti_diagonals = [0] * (2 * n - 1), [0] * (2 * n - 1)
+                queens = self.queen_positions
+                self._columns = 0
+            for row, column in queens:
+                diagonals[row - column + n - 1] += 1
+                anti_diagonals[row + column] += 1
+                self._columns |= 1 << column
+            self._diagonals, self._anti_diagonals = diagonals, anti_diagonals
+        return self._columns, self._diagonals, self._anti_diagonals
+
+    def _make_child(self, queen_positions, columns, g):
+        """Builds a child with one more queen.
+
+        Equivalent to `type(self)(self, g, queen_positions, self.n)`, but the
+        child starts with the column mask, and its diagonal counts are built
+        from the ones of this node when they are first needed.
+        """
+        child = type(self).__new__(type(self))
+        child.queen_positions = queen_positions
+        child.n = self.n
+        child._columns = columns
+        child._parent_counts = (self._diagonals, self._anti_diagonals)
+        Node.__init__(child, self, g)
+        return child
+
     def generate_children(self):
         """Generates children by adding a new queen.
 
@@ -266,18 +744,49 @@ class NqueensNode(Node):
         # return children
 
         children = []
-        if len(self.queen_positions) >= self.n:
+        queens = self.queen_positions
+        row = len(queens)
+        if row >= self.n:
             return []
-        
+
+        # Every column is checked and priced in O(1) from the occupancy of the
+        # board; the child's queen list is a shallow copy (its tuples are immutable).
+        columns = self._occupancy()[0]
+        conflict_count = self.conflict_count
         for i in range(self.n):
-            if self.addable((len(self.queen_positions),i)):
-                new_queen_pos = deepcopy(self.queen_positions)
-                new_queen_pos.append((len(self.queen_positions),i))
-                conflicts = self.conflict_count((len(self.queen_positions),i))
-                new_node = NqueensNode(self, self.g+conflicts, new_queen_pos, self.n)
-                children.append(new_node)
+            if not columns >> i & 1:
+                conflicts = conflict_count((row, i))
+                children.append(self._make_child(queens + [(row, i)], columns | 1 << i, self.g + conflicts))
         return children
-        pass
+
+    def successors(self):
+        """Generates the children lazily, for the depth-first searches. The
+        children come in order of the attacks added by their queen, and a
+        child is only built (and its heuristic evaluated) when the search
+        calls its function.
+
+        Yields
+        ------
+            (bound, build) : (int or float, callable)
+                A lower bound of the f of the child, never smaller than the
+                bound before it, and a function building the child. As the
+                heuristic is consistent, the bound is the larger of the f of
+                this node and the g of the child.
+        """
+        row = len(self.queen_positions)
+        if row >= self.n:
+            return
+        columns = self._occupancy()[0]
+        conflict_count = self.conflict_count
+        floor = self.f if _own_heuristic(self, NqueensNode) else -inf
+        moves = sorted((self.g + conflict_count((row, i)), i) for i in range(self.n) if not columns >> i & 1)
+        for g, column in moves:
+            yield max(floor, g), partial(self._place_queen, column, g)
+
+    def _place_queen(self, column, g):
+        """Builds the child with a queen on the next row, in `column`, and cost g."""
+        return self._make_child(self.queen_positions + [(len(self.queen_positions), column)],
+                                self._columns | 1 << column, g)
 
     # def is_conflict(self, new_queen_pos):
     #     for i in range(len(self.queen_positions)):
@@ -312,6 +821,21 @@ class NqueensNode(Node):
         # NOTE: You shouldn't modify this method.
         return tuple(self.queen_positions)
 
+    def canonical_state(self):
+        """Returns the same key for this placement and for its mirror image
+        (columns reversed), which has the same attacks and the same completions.
+        The searches use it for duplicate detection when they run with
+        `symmetry=True`, so e.g. only half of the first-row choices are explored.
+
+        Returns
+        -------
+            key: tuple
+                The smaller of the state and of the state of the mirrored placement.
+        """
+        last = self.n - 1
+        state = self.state
+        return min(state, tuple([(row, last - column) for row, column in state]))
+
 
     def evaluate_heuristic(self):
         """Heuristic function h(n) that estimates the minimum number of moves
@@ -327,9 +851,34 @@ class NqueensNode(Node):
         and no knight moves that is attacking other queens).
         """
 
-        # TODO: add your code here
-        return 0
-        pass
+        # Lower bound on the attacks the remaining rows will add: every queen still
+        # to place attacks at least the placed queens of its best free column.
+        # The attacks of different rows with the placed queens are different
+        # pairs, so the sum never overestimates (and is consistent).
+        queens = self.queen_positions
+        placed, n = len(queens), self.n
+        if placed == 0 or placed >= n:
+            return 0
+        taken, diagonals, anti_diagonals = self._occupancy()
+        free = [column for column in range(n) if not taken >> column & 1]
+        h = 0
+        for row in range(placed, n):
+            # Only the two rows after the placed queens are in knight range of them:
+            # (column of the queen, column distance of a knight's move).
+            knights = [(queens[row - d_row][1], 3 - d_row) for d_row in (1, 2) if 0 <= row - d_row < placed]
+            best = inf
+            for column in free:
+                attacks = diagonals[row - column + n - 1] + anti_diagonals[row + column]
+                for knight_column, distance in knights:
+                    if abs(knight_column - column) == distance:
+                        attacks += 1
+                if attacks < best:
+                    best = attacks
+                    if best == 0:
+                        break
+            h += best
+        return h
+
     def __str__(self):
         """Returns the string representation of this node.
 
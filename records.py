@@ -0,0 +1,76 @@
+"""Compact records of the nodes reached by a search.
+
+In the lightweight mode of the searches (`Astar(root, lightweight=True)`,
+`BFS(root, lightweight=True)`), the nodes do not keep their parent: the
+search only records, for every node it reaches, the state, the index of the
+parent's record, the move (the position of the node in the children of its
+parent) and g. The interior nodes are then freed as soon as they have been
+expanded, and the nodes of the solution path are built again from the root
+by replaying the moves.
+
+The moves are replayed with `generate_children`, which must therefore always
+return the children of a node in the same order.
+"""
+from array import array
+
+# Parent index of the root record.
+NO_PARENT = -1
+
+
+class SearchRecords:
+    """A table of (state, parent index, move, g) records, stored column by column.
+
+    Attributes
+    ----------
+    states : list
+        The state of every record.
+
+    parents : array of int
+        The index of the parent record, NO_PARENT for the root.
+
+    moves : array of int
+        The position of the node in the children of its parent.
+
+    g : array of float
+        The cost to reach the node from the root.
+    """
+    def __init__(self):
+        self.states = []
+        self.parents = array('q')
+        self.moves = array('H')
+        self.g = array('d')
+
+    def __len__(self):
+        return len(self.states)
+
+    def add(self, state, parent, move, g):
+        """Appends a record and returns its index."""
+        self.states.append(state)
+        self.parents.append(parent)
+        self.moves.append(move)
+        self.g.append(g)
+        return len(self.states) - 1
+
+    def moves_to(self, index):
+        """Returns the moves from the root to the node of record `index`."""
+        moves = []
+        parents, all_moves = self.parents, self.moves
+        while parents[index] != NO_PARENT:
+            moves.append(all_moves[index])
+            index = parents[index]
+        moves.reverse()
+        return moves
+
+    def path(self, root, index):
+        """Rebuilds the path from `root` to the node of record `index`.
+
+        Returns
+        -------
+            path : list of Nodes
+                The same nodes as `node.get_path()` would return in a search
+                that keeps the parents: every node is a child of the previous one.
+        """
+        path = [root]
+        for move in self.moves_to(index):
+            path.append(path[-1].generate_children()[move])
+        return path
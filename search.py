@@ -2,11 +2,23 @@ from copy import deepcopy
 from node import Node
 """Implement search algorithm
 """
-from queue import PriorityQueue
+from collections import deque
+from functools import partial
+from itertools import chain, count
+from math import inf
+from operator import attrgetter, methodcaller
 import heapq
 import time
 
-def BFS(root: Node):
+from budget import BudgetExceeded, BudgetExhausted, CancellationToken, SearchBudget
+from instrumentation import Probe, SearchStats, prebuilt, successors
+from records import NO_PARENT, SearchRecords
+
+# The key of a node in the closed/visited sets, without or with symmetry reduction.
+_state = attrgetter('state')
+_canonical_state = methodcaller('canonical_state')
+
+def BFS(root: Node, stats=None, on_expand=None, budget=None, lightweight=False, symmetry=False):
     """Runs the BFS algorithm given the root node. The class of the root node
     defines the problem that's being solved. The algorithm either returns the solution
     as a path from the start node to the goal node or returns None if there's no solution.
@@ -16,11 +28,36 @@ def BFS(root: Node):
     root: Node
         The start node of the problem to be solved.
 
+    stats: SearchStats, optional
+        Filled with the counters and timings of the run.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the run (expansions, time, memory, cancellation).
+
+    lightweight: bool, optional
+        If True, the nodes do not keep their parent and the search records
+        their ancestry in a compact table instead (see records.py), so only
+        the frontier holds full nodes. The path is rebuilt at the end and is
+        the same as without it. The best node of a BudgetExhausted then has
+        no parent. Default is False.
+
+    symmetry: bool, optional
+        If True, the states are compared by `node.canonical_state()`, which is
+        the same for the states that are symmetric images of each other (the
+        mirrored queens, the transposed puzzle). Only one state of every such
+        set is explored, e.g. one of each pair of mirrored first-row choices of
+        the queens. The nodes themselves are never transformed, so the path is
+        in the orientation of the root. Default is False.
+
     Returns
     -------
         path: list of Nodes or None
             The solution, a path from the initial node to the goal node.
-            If there is no solution it should return None
+            If there is no solution it should return None, and if the budget
+            runs out it returns a BudgetExhausted.
     """
     # TODO: add your code here
     # Some helper pseudo-code:
@@ -30,20 +67,31 @@ def BFS(root: Node):
     # 4.      If that's a goal node, return node.get_path()
     # 5.      Otherwise, add the children of the node to the end of the fringe
     # 6. Return None
-    fringe = [root]
-    visited = set()
-    while fringe:
-        node = fringe.pop(0)
-        if node.is_goal():
-            return node.get_path()
-        for child in node.generate_children():
-            if child not in visited:
-                fringe.append(child)
-                visited.add(child)
-    return None
-    raise NotImplementedError
-
-def DFS(root: Node):
+    probe = Probe(stats, on_expand, budget)
+    key = _canonical_state if symmetry else _state
+    if lightweight:
+        return _lightweight_BFS(root, probe, key)
+    fringe = deque([root])
+    visited = {key(root)}
+    probe.watch((fringe,), (visited,))
+    is_goal, expand = probe.is_goal, probe.expand
+    pop, push = probe.queue(fringe.popleft), probe.queue(fringe.append)
+    with probe.running():
+        while fringe:
+            node = pop()
+            if is_goal(node):
+                return node.get_path()
+            for child in expand(node):
+                state = key(child)
+                if state not in visited:
+                    visited.add(state)
+                    push(child)
+                else:
+                    probe.duplicate()
+        return None
+    return probe.exhausted
+
+def DFS(root: Node, stats=None, on_expand=None, budget=None, symmetry=False):
     """Runs the DFS algorithm given the root node. The class of the root node
     defines the problem that's being solved. The algorithm either returns the solution
     as a path from the start node to the goal node or returns None if there's no solution.
@@ -53,11 +101,29 @@ def DFS(root: Node):
     root: Node
         The start node of the problem to be solved.
 
+    stats: SearchStats, optional
+        Filled with the counters and timings of the run.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the run (expansions, time, memory, cancellation).
+
+    symmetry: bool, optional
+        If True, the states are compared by `node.canonical_state()`, which is
+        the same for the states that are symmetric images of each other (the
+        mirrored queens, the transposed puzzle). Only one state of every such
+        set is explored, e.g. one of each pair of mirrored first-row choices of
+        the queens. The nodes themselves are never transformed, so the path is
+        in the orientation of the root. Default is False.
+
     Returns
     -------
         path: list of Nodes or None
             The solution, a path from the initial node to the goal node.
-            If there is no solution it should return None
+            If there is no solution it should return None, and if the budget
+            runs out it returns a BudgetExhausted.
     """
     # TODO: add your code here
     # Some helper pseudo-code:
@@ -67,20 +133,38 @@ def DFS(root: Node):
     # 4.      If that's a goal node, return node.get_path()
     # 5.      Otherwise, add the children of the node to the beginning of the fringe
     # 6. Return None
-    fringe = [root]
-    visited = set()
-    while fringe:
-        node = fringe.pop()
-        if node.is_goal():
-            return node.get_path()
-        for child in node.generate_children():
-            if child not in visited:
-                fringe.append(child)
-                visited.add(child)
-    return None
-    raise NotImplementedError
-
-def Astar(root: Node):
+    # The fringe is a stack of the lazy successors (see `NpuzzleNode.successors`)
+    # of the nodes of the current branch: a child is only built when the search
+    # gets to it, best first, and the move back to the parent is never tried.
+    probe = Probe(stats, on_expand, budget)
+    key = _canonical_state if symmetry else _state
+    visited = {key(root)}
+    stack = []
+    probe.watch((stack,), (visited,))
+    is_goal, successors = probe.is_goal, probe.successors
+    with probe.running():
+        if is_goal(root):
+            return root.get_path()
+        stack.append(successors(root))
+        while stack:
+            successor = next(stack[-1], None)
+            if successor is None:
+                stack.pop()
+                continue
+            child = successor[1]()
+            state = key(child)
+            if state in visited:
+                probe.duplicate()
+                continue
+            visited.add(state)
+            if is_goal(child):
+                return child.get_path()
+            stack.append(successors(child))
+        return None
+    return probe.exhausted
+
+def Astar(root: Node, stats=None, on_expand=None, budget=None, lightweight=False, weight=1,
+          symmetry=False, checkpoint=None):
     """Runs the A* algorithm given the root node. The class of the root node
     defines the problem that's being solved. The algorithm either returns the solution
     as a path from the start node to the goal node or returns None if there's no solution.
@@ -90,11 +174,46 @@ def Astar(root: Node):
     root: Node
         The start node of the problem to be solved.
 
+    stats: SearchStats, optional
+        Filled with the counters and timings of the run.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the run (expansions, time, memory, cancellation).
+
+    lightweight: bool, optional
+        If True, the nodes do not keep their parent and the search records
+        their ancestry in a compact table instead (see records.py), so only
+        the frontier holds full nodes. The path is rebuilt at the end and is
+        the same as without it. The best node of a BudgetExhausted then has
+        no parent. Default is False.
+
+    weight: int or float, optional
+        Runs weighted A*: the nodes are ordered by g + weight * h. With an
+        admissible heuristic the cost of the path is at most `weight` times the
+        optimal cost, and far fewer nodes are usually expanded. Default is 1
+        (plain, optimal A*).
+
+    symmetry: bool, optional
+        If True, the states are compared by `node.canonical_state()`, which is
+        the same for the states that are symmetric images of each other (the
+        mirrored queens, the transposed puzzle). Only one state of every such
+        set is explored, e.g. one of each pair of mirrored first-row choices of
+        the queens. The nodes themselves are never transformed, so the path is
+        in the orientation of the root. Default is False.
+
+    checkpoint: checkpoint.Checkpoint, optional
+        Saves snapshots of the search, which `checkpoint.resume` continues
+        after a restart. The search then runs in the lightweight mode.
+
     Returns
     -------
         path: list of Nodes or None
             The solution, a path from the initial node to the goal node.
-            If there is no solution it should return None
+            If there is no solution it should return None, and if the budget
+            runs out it returns a BudgetExhausted.
     """
 
     # TODO: add your code here
@@ -111,33 +230,604 @@ def Astar(root: Node):
     # You should consider the states evaluated and the ones in the fringe to avoid repeated calculation in 5. above.
     # You can compare two node states by node1.state == node2.state 
 
-    # fringe = [(root.f, root)]
-    # heapq.heapify(fringe)
-    # visited = set()
-
-    # while fringe:
-    #     f, node = heapq.heappop(fringe)
-    #     if node.is_goal():
-    #         return node.get_path()
-    #     for child in node.generate_children():
-    #         if child not in visited or (child.f, child) in fringe:
-    #             heapq.heappush(fringe, (child.f, child))
-    #             visited.add(child)
-    # return None
-
-    fringe = PriorityQueue()
-    visited = []
-
-    fringe.put((root.f, root))
-    while not fringe.empty():
-        element = fringe.get()
-        current = element[1]
-        if current._get_state() not in visited:
-            visited.append(current._get_state())
-            if current.is_goal():
-                return current.get_path()
-            for child in current.generate_children():
-                if child._get_state() not in visited:
-                    fringe.put((child.f, child))
-    return None
-    raise NotImplementedError
\ No newline at end of file
+    # The open list is a binary heap ordered by (g + weight * h, h, insertion order).
+    # Entries are never removed in place: a node whose g is worse than the best g
+    # known for its state is simply skipped when it is popped (lazy deletion).
+    probe = Probe(stats, on_expand, budget)
+    key = _canonical_state if symmetry else _state
+    if lightweight or checkpoint is not None:
+        return _lightweight_Astar(root, probe, weight, key, checkpoint)
+    counter = count()
+    h = root.f - root.g
+    fringe = [(root.g + weight * h, h, next(counter), root)]
+    best_g = {key(root): root.g}
+    closed = set()
+    probe.watch((fringe,), (closed,))
+    is_goal, expand = probe.is_goal, probe.expand
+    pop, push = probe.queue(heapq.heappop), probe.queue(heapq.heappush)
+
+    with probe.running():
+        while fringe:
+            _, _, _, node = pop(fringe)
+            state = key(node)
+            if state in closed or node.g > best_g[state]:
+                continue
+            if is_goal(node):
+                return node.get_path()
+            closed.add(state)
+            for child in expand(node):
+                child_state = key(child)
+                if child_state in closed or child.g >= best_g.get(child_state, inf):
+                    probe.duplicate()
+                    continue
+                best_g[child_state] = child.g
+                h = child.f - child.g
+                push(fringe, (child.g + weight * h, h, next(counter), child))
+        return None
+    return probe.exhausted
+
+def _lightweight_BFS(root, probe, key):
+    """BFS that keeps a SearchRecords table instead of the parents of the nodes."""
+    records = SearchRecords()
+    index_of = {key(root): records.add(key(root), NO_PARENT, 0, root.g)}
+    fringe = deque([(0, root)])
+    probe.watch((fringe,), (index_of,))
+    is_goal, expand = probe.is_goal, probe.expand
+    pop, push = probe.queue(fringe.popleft), probe.queue(fringe.append)
+    with probe.running():
+        while fringe:
+            index, node = pop()
+            if is_goal(node):
+                return records.path(root, index)
+            for move, child in enumerate(expand(node)):
+                state = key(child)
+                if state not in index_of:
+                    child.parent = None
+                    child_index = index_of[state] = records.add(state, index, move, child.g)
+                    push((child_index, child))
+                else:
+                    probe.duplicate()
+        return None
+    return probe.exhausted
+
+def _lightweight_Astar(root, probe, weight, key, checkpoint=None, snapshot=None):
+    """A* that keeps a SearchRecords table instead of the parents of the nodes.
+    The record of a state is replaced when a cheaper path to it is found, so a
+    popped node is stale when its index is not the current one of its state.
+    With a `snapshot` (see checkpoint.py), the search goes on from it.
+    """
+    if snapshot is None:
+        records = SearchRecords()
+        counter = count()
+        index_of = {key(root): records.add(key(root), NO_PARENT, 0, root.g)}
+        h = root.f - root.g
+        fringe = [(root.g + weight * h, h, next(counter), 0, root)]
+        closed = set()
+    else:
+        records, counter, index_of, fringe, closed = _restore_Astar(root, snapshot)
+    g = records.g
+    probe.watch((fringe,), (closed,))
+    is_goal, expand = probe.is_goal, probe.expand
+    pop, push = probe.queue(heapq.heappop), probe.queue(heapq.heappush)
+
+    def save():
+        checkpoint.save({
+            'search': 'Astar', 'root': root, 'weight': weight, 'symmetry': key is _canonical_state,
+            'records': (records.states, records.parents, records.moves, records.g),
+            # The entries keep their heap order, so the resumed search pops them in the same order.
+            'fringe': [entry[:4] for entry in fringe], 'counter': next(counter),
+            'closed': [index_of[state] for state in closed],
+            'stats': None if probe.stats is None else probe.stats.as_dict(),
+        })
+
+    with probe.running():
+        while fringe:
+            if checkpoint is not None and checkpoint.due():
+                save()
+            entry = pop(fringe)
+            _, _, _, index, node = entry
+            state = key(node)
+            if state in closed or index != index_of[state]:
+                continue
+            if is_goal(node):
+                return records.path(root, index)
+            try:
+                children = expand(node)
+            except BudgetExceeded:
+                if checkpoint is not None:
+                    heapq.heappush(fringe, entry)
+                    save()
+                raise
+            closed.add(state)
+            for move, child in enumerate(children):
+                child_state = key(child)
+                known = index_of.get(child_state)
+                if child_state in closed or (known is not None and child.g >= g[known]):
+                    probe.duplicate()
+                    continue
+                child.parent = None
+                child_index = index_of[child_state] = records.add(child_state, index, move, child.g)
+                h = child.f - child.g
+                push(fringe, (child.g + weight * h, h, next(counter), child_index, child))
+        return None
+    return probe.exhausted
+
+def _restore_Astar(root, snapshot):
+    """Rebuilds the records, the frontier and the closed set of a lightweight A*
+    snapshot. The frontier nodes are rebuilt from the root by replaying the
+    moves of their records, sharing the common ancestors.
+    """
+    records = SearchRecords()
+    records.states, records.parents, records.moves, records.g = snapshot['records']
+    index_of = {state: index for index, state in enumerate(records.states)}
+    nodes = _replay(root, records, [entry[3] for entry in snapshot['fringe']])
+    fringe = [entry + (nodes[entry[3]],) for entry in snapshot['fringe']]
+    closed = {records.states[index] for index in snapshot['closed']}
+    return records, count(snapshot['counter']), index_of, fringe, closed
+
+def _replay(root, records, indices):
+    """Returns {index: node} for the records `indices`, built from the root by
+    replaying the moves, without parents as in the lightweight mode.
+    """
+    parents, moves = records.parents, records.moves
+    needed = set()
+    for index in indices:
+        while index not in needed and index != 0:
+            needed.add(index)
+            index = parents[index]
+    nodes = {0: root}
+    children = {}
+    for index in sorted(needed):
+        parent = parents[index]
+        if parent not in children:
+            children[parent] = nodes[parent].generate_children()
+        node = nodes[index] = children[parent][moves[index]]
+        node.parent = None
+    return nodes
+
+def ARAstar(root: Node, weight=3, decrement=0.5, stats=None, on_expand=None, budget=None):
+    """Runs the anytime repairing A* (ARA*) algorithm given the root node.
+    It starts as a weighted A* with a large weight, which finds a first solution
+    quickly, then lowers the weight round after round and reuses the previous
+    rounds' work to improve the solution, until it is proven optimal or the
+    budget (e.g. its deadline) runs out.
+
+    Parameters
+    ----------
+    root: Node
+        The start node of the problem to be solved.
+
+    weight: int or float, optional
+        The weight of the first round. Default is 3.
+
+    decrement: int or float, optional
+        How much the weight is lowered after every round, down to 1. Default is 0.5.
+
+    stats: SearchStats, optional
+        Filled with the counters and timings of all the rounds.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the whole run, e.g. `SearchBudget(time_limit=1.0)`.
+
+    Yields
+    ------
+        (path, bound): (list of Nodes, float)
+            The best solution after every round that has one, and its proven
+            suboptimality bound: with an admissible heuristic, the cost of the
+            path is at most `bound` times the optimal cost. The last bound is 1
+            unless the budget ran out. Nothing is yielded if there is no solution.
+
+    Returns
+    -------
+        exhausted: BudgetExhausted or None
+            The value of the StopIteration that ends the generator (e.g. the
+            value of `yield from`): a BudgetExhausted if the budget ran out,
+            whether or not a solution was yielded before, otherwise None.
+    """
+    probe = Probe(stats, on_expand, budget)
+    if root.is_goal():
+        yield root.get_path(), 1
+        return
+    counter = count()
+    nodes = {root.state: root}
+    fringe = [(root.g + weight * (root.f - root.g), next(counter), root)]
+    closed = set()
+    # The states whose g improved after they were expanded in this round.
+    inconsistent = {}
+    goal = None
+    probe.watch((fringe, inconsistent), (closed,))
+    is_goal, expand = probe.is_goal, probe.expand
+    pop, push = probe.queue(heapq.heappop), probe.queue(heapq.heappush)
+
+    while True:
+        cost = goal.g if goal is not None else inf
+        with probe.running():
+            while fringe and fringe[0][0] < cost:
+                _, _, node = pop(fringe)
+                state = node.state
+                if state in closed or nodes[state] is not node:
+                    continue
+                closed.add(state)
+                for child in expand(node):
+                    child_state = child.state
+                    known = nodes.get(child_state)
+                    if known is not None and child.g >= known.g:
+                        probe.duplicate()
+                        continue
+                    nodes[child_state] = child
+                    if is_goal(child):
+                        if child.g < cost:
+                            goal, cost = child, child.g
+                    elif child_state in closed:
+                        inconsistent[child_state] = child
+                    else:
+                        push(fringe, (child.g + weight * (child.f - child.g), next(counter), child))
+        if probe.exhausted is not None:
+            return probe.exhausted
+
+        # A round without a goal has visited every reachable state.
+        if goal is None:
+            return
+        # The open and inconsistent nodes bound the cost of any better solution.
+        candidates = [node for _, _, node in fringe if nodes[node.state] is node and node.state not in closed]
+        candidates.extend(inconsistent.values())
+        lowest_f = min((node.f for node in candidates), default=inf)
+        bound = max(1, min(weight, cost / lowest_f)) if lowest_f > 0 else weight
+        yield goal.get_path(), bound
+        if bound <= 1 or weight <= 1:
+            return
+
+        weight = max(1, weight - decrement)
+        fringe[:] = [(node.g + weight * (node.f - node.g), next(counter), node)
+                     for node in {node.state: node for node in candidates}.values()]
+        heapq.heapify(fringe)
+        closed.clear()
+        inconsistent.clear()
+
+def IDAstar(root: Node, on_iteration=None, stats=None, on_expand=None, budget=None, checkpoint=None):
+    """Runs the IDA* (iterative-deepening A*) algorithm given the root node.
+    Each iteration is a depth-first search bounded by an f-threshold, so the
+    memory used is linear in the depth of the solution. The algorithm either
+    returns the solution as a path from the start node to the goal node or
+    returns None if there's no solution.
+
+    Parameters
+    ----------
+    root: Node
+        The start node of the problem to be solved.
+
+    on_iteration: callable, optional
+        Called with the f-threshold at the start of every iteration.
+
+    stats: SearchStats, optional
+        Filled with the counters and timings of the run.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the run (expansions, time, memory, cancellation).
+
+    checkpoint: checkpoint.Checkpoint, optional
+        Saves snapshots of the search (the threshold and the current branch),
+        which `checkpoint.resume` continues after a restart.
+
+    Returns
+    -------
+        path: list of Nodes or None
+            The solution, a path from the initial node to the goal node.
+            If there is no solution it should return None, and if the budget
+            runs out it returns a BudgetExhausted.
+    """
+    return _IDAstar(root, Probe(stats, on_expand, budget), on_iteration, checkpoint)
+
+def _IDAstar(root, probe, on_iteration, checkpoint=None, snapshot=None):
+    """The iterations of IDA*, from the first one or from a `snapshot` (see checkpoint.py)."""
+    threshold, branch, next_threshold = root.f, None, inf
+    if snapshot is not None:
+        threshold, next_threshold = snapshot['threshold'], snapshot['next_threshold']
+        branch = _restore_branch(root, snapshot['moves'])
+    with probe.running():
+        while True:
+            if on_iteration is not None:
+                on_iteration(threshold)
+            goal, threshold = _bounded_dfs(root, threshold, probe, checkpoint, branch, next_threshold)
+            if goal is not None:
+                return goal.get_path()
+            if threshold == inf:
+                return None
+            branch, next_threshold = None, inf
+    return probe.exhausted
+
+def _bounded_dfs(root, threshold, probe, checkpoint=None, branch=None, next_threshold=inf):
+    """Depth-first search that does not go past nodes with f > threshold.
+    It starts from the root, or goes on from a `branch` (path, stack) rebuilt
+    from a snapshot, with the `next_threshold` found so far.
+
+    Returns
+    -------
+        (goal, next_threshold) : (Node or None, int or float)
+            The goal node if one was found, and the smallest f-value that
+            exceeded the threshold (the threshold of the next iteration).
+    """
+    # `path` holds the nodes of the current branch and `stack` the lazy successors
+    # (see `NpuzzleNode.successors`) of each of them that are left to try, so
+    # both grow with the depth only.
+    path, stack = ([], [iter(((root.f, partial(prebuilt, root)),))]) if branch is None else branch
+    on_path = {node.state for node in path}
+    probe.watch((path,), (on_path,))
+
+    def save():
+        # The snapshot is taken before the last node of the branch is expanded.
+        checkpoint.save({
+            'search': 'IDAstar', 'root': root, 'threshold': threshold, 'next_threshold': next_threshold,
+            'moves': _branch_moves(path),
+            'stats': None if probe.stats is None else probe.stats.as_dict(),
+        })
+
+    is_goal, successors = probe.is_goal, probe.successors
+    while stack:
+        successor = next(stack[-1], None)
+        if successor is None:
+            stack.pop()
+            if path:
+                on_path.discard(path.pop().state)
+            continue
+        bound, build = successor
+        if bound > threshold:
+            next_threshold = min(next_threshold, bound)
+            # The bounds never decrease: the other successors are cut off as well.
+            stack[-1] = iter(())
+            continue
+        node = build()
+        if node.f > threshold:
+            next_threshold = min(next_threshold, node.f)
+            continue
+        # Skipping states already on the branch also prunes the move that
+        # undoes the parent's move (the child equals the grandparent).
+        if node.state in on_path:
+            probe.duplicate()
+            continue
+        if is_goal(node):
+            return node, threshold
+        path.append(node)
+        on_path.add(node.state)
+        if checkpoint is not None and checkpoint.due():
+            save()
+        try:
+            stack.append(successors(node))
+        except BudgetExceeded:
+            if checkpoint is not None:
+                save()
+            raise
+    return None, next_threshold
+
+def _branch_moves(path):
+    """The position of every node of a branch in the successors of the previous one."""
+    moves = []
+    for parent, node in zip(path, path[1:]):
+        for move, (_, build) in enumerate(successors(parent)):
+            if build().state == node.state:
+                moves.append(move)
+                break
+    return moves
+
+def _restore_branch(root, moves):
+    """Rebuilds the (path, stack) of `_bounded_dfs` from the moves of a saved
+    branch. The last node of the branch is put back in front of its remaining
+    siblings, so that it is the next one to be expanded.
+    """
+    path, stack = [], [iter(((root.f, partial(prebuilt, root)),))]
+    for move in moves:
+        bound, build = next(stack[-1])
+        node = build()
+        path.append(node)
+        remaining = successors(node)
+        for _ in range(move):
+            next(remaining)
+        stack.append(chain([next(remaining)], remaining))
+    return path, stack
+
+def BidirectionalBFS(root: Node, goal: Node = None, stats=None, on_expand=None, budget=None):
+    """Runs a breadth-first search from both the root node and the goal node,
+    expanding one whole layer of the smaller side at a time until the two
+    searches meet. The problem must have a single goal state and reversible
+    moves, e.g. the NpuzzleNode.
+
+    Parameters
+    ----------
+    root: Node
+        The start node of the problem to be solved.
+
+    goal: Node, optional
+        The root of the backward search. Default is `type(root).goal_node(root.size)`.
+
+    stats: SearchStats, optional
+        Filled with the counters and timings of the run.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the run (expansions, time, memory, cancellation).
+
+    Returns
+    -------
+        path: list of Nodes or None
+            The solution, a path from the initial node to the goal node.
+            If there is no solution it should return None, and if the budget
+            runs out it returns a BudgetExhausted.
+    """
+    if goal is None:
+        goal = type(root).goal_node(root.size)
+    if root.state == goal.state:
+        return [root]
+
+    probe = Probe(stats, on_expand, budget)
+    forward, backward = {root.state: root}, {goal.state: goal}
+    forward_layer, backward_layer = [root], [goal]
+    forward_expand, backward_expand = probe.expand, probe.expander(observe=False)
+    with probe.running():
+        while forward_layer and backward_layer:
+            probe.watch((forward_layer, backward_layer), (forward, backward))
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meet = _expand_layer(forward_layer, forward, backward, forward_expand, probe)
+            else:
+                backward_layer, meet = _expand_layer(backward_layer, backward, forward, backward_expand, probe)
+            if meet is not None:
+                return _join(forward[meet], backward[meet])
+        return None
+    return probe.exhausted
+
+def _expand_layer(layer, seen, other, expand, probe):
+    """Expands a whole BFS layer, recording the new nodes in `seen`.
+
+    Returns
+    -------
+        (next_layer, meet) : (list of Nodes, state or None)
+            The next layer, and the state where this side met `other` with the
+            fewest moves on the other side, if any.
+    """
+    next_layer = []
+    meet = None
+    for node in layer:
+        for child in expand(node):
+            state = child.state
+            if state in seen:
+                probe.duplicate()
+                continue
+            seen[state] = child
+            next_layer.append(child)
+            # All the meetings of this layer are at the same depth on this side,
+            # so the shortest path goes through the shallowest node of the other.
+            if state in other and (meet is None or other[state].g < other[meet].g):
+                meet = state
+    return next_layer, meet
+
+def BidirectionalAstar(root: Node, goal: Node = None, stats=None, on_expand=None, budget=None):
+    """Runs a bidirectional A* search with front-to-end heuristics: the forward
+    search uses the heuristic of the nodes and the backward search uses
+    `node.heuristic_to(root.state)`. The side with the smaller open list is
+    expanded first, and the search stops once neither side can improve the best
+    path through a meeting state. The problem must have a single goal state and
+    reversible moves, e.g. the NpuzzleNode.
+
+    Parameters
+    ----------
+    root: Node
+        The start node of the problem to be solved.
+
+    goal: Node, optional
+        The root of the backward search. Default is `type(root).goal_node(root.size)`.
+
+    stats: SearchStats, optional
+        Filled with the counters and timings of the run.
+
+    on_expand: callable, optional
+        Called as `on_expand(node, stats)` every time a node is expanded.
+
+    budget: SearchBudget, optional
+        The limits of the run (expansions, time, memory, cancellation).
+
+    Returns
+    -------
+        path: list of Nodes or None
+            The solution, a path from the initial node to the goal node.
+            If there is no solution it should return None, and if the budget
+            runs out it returns a BudgetExhausted.
+    """
+    if goal is None:
+        goal = type(root).goal_node(root.size)
+    if root.state == goal.state:
+        return [root]
+
+    probe = Probe(stats, on_expand, budget)
+    counter = count()
+    forward = _HalfSearch(root, lambda node: node.f - node.g, counter, probe, probe.expand)
+    backward = _HalfSearch(goal, lambda node: node.heuristic_to(root.state), counter, probe,
+                           probe.expander(observe=False))
+    probe.watch((forward.fringe, backward.fringe), (forward.closed, backward.closed))
+    best_cost, meet = inf, None
+    with probe.running():
+        while forward.fringe and backward.fringe:
+            if max(forward.min_f(), backward.min_f()) >= best_cost:
+                break
+            side, other = (forward, backward) if len(forward.fringe) <= len(backward.fringe) else (backward, forward)
+            for child in side.expand():
+                other_node = other.nodes.get(child.state)
+                if other_node is not None and child.g + other_node.g < best_cost:
+                    best_cost = child.g + other_node.g
+                    meet = child.state
+    if probe.exhausted is not None:
+        return probe.exhausted
+    if meet is None:
+        return None
+    return _join(forward.nodes[meet], backward.nodes[meet])
+
+class _HalfSearch:
+    """One direction of a bidirectional A* search: a heap of (f, h, insertion
+    order, node) with lazy deletion, and the best node found for each state.
+    """
+    def __init__(self, root, heuristic, counter, probe, expand):
+        self.heuristic = heuristic
+        self.counter = counter
+        self.probe = probe
+        self._expand = expand
+        self._pop = probe.queue(heapq.heappop)
+        self._push = probe.queue(heapq.heappush)
+        h = heuristic(root)
+        self.fringe = [(root.g + h, h, next(counter), root)]
+        self.nodes = {root.state: root}
+        self.closed = set()
+
+    def min_f(self):
+        """Drops stale entries from the top of the heap and returns the lowest f (inf if empty)."""
+        fringe = self.fringe
+        while fringe:
+            node = fringe[0][3]
+            if node.state not in self.closed and self.nodes[node.state] is node:
+                return fringe[0][0]
+            heapq.heappop(fringe)
+        return inf
+
+    def expand(self):
+        """Expands the best open node and returns the children that improved the best g of their state."""
+        if self.min_f() == inf:
+            return []
+        node = self._pop(self.fringe)[3]
+        self.closed.add(node.state)
+        improved = []
+        for child in self._expand(node):
+            state = child.state
+            known = self.nodes.get(state)
+            if state in self.closed or (known is not None and known.g <= child.g):
+                self.probe.duplicate()
+                continue
+            self.nodes[state] = child
+            h = self.heuristic(child)
+            self._push(self.fringe, (child.g + h, h, next(self.counter), child))
+            improved.append(child)
+        return improved
+
+def _join(forward_node, backward_node):
+    """Stitches a path from the root to `forward_node` with the path from the
+    same state back to the goal described by the parents of `backward_node`.
+    The backward half is replayed from the forward side, so every node of the
+    result is a genuine child of the previous one, as with `get_path`.
+    """
+    path = forward_node.get_path()
+    node = backward_node.parent
+    while node is not None:
+        path.append(_child_with_state(path[-1], node.state))
+        node = node.parent
+    return path
+
+def _child_with_state(node, state):
+    """Returns the child of `node` whose state is `state`."""
+    for child in node.generate_children():
+        if child.state == state:
+            return child
+    raise ValueError('state {} is not reachable from {} in one move'.format(state, node.state))
@@ -0,0 +1,309 @@
+"""An asyncio front end that solves NpuzzleNode and NqueensNode jobs.
+
+The searches run on a bounded pool of threads, so the event loop stays free
+while they run. A job is admitted only if fewer than `workers + backlog` jobs
+are waiting or running; otherwise `submit` raises ServiceBusy at once
+instead of queueing without limit. While a job runs, its progress (nodes
+expanded and the current f-bound) is streamed to the caller, and a job can be
+cancelled at any time through the CancellationToken of its budget.
+
+The jobs are the instances of batch.py (a puzzle input string or a queens
+board size) and their results are BatchResults, with the extra status
+CANCELLED. The service is used in-process::
+
+    >>> async with SolverService(workers=2) as service:
+    ...     job = service.submit('1 2 3\\n4 5 6\\n0 7 8', 'Astar', timeout=10)
+    ...     async for event in job.events():
+    ...         print(event)
+
+or over a local socket, one job per connection, with JSON lines: the client
+sends {"instance": ..., "algorithm": ..., "timeout": ...} and receives the
+"progress" events, then the "result" event (or a single "rejected" event).
+The client may shut down its side of the connection once the request is
+sent. Closing the connection cancels the job, as soon as an event can no
+longer be written to it::
+
+    $ python service.py --port 8765
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from batch import ALGORITHMS, ERROR, NO_SOLUTION, SOLVED, TIMEOUT, BatchResult, make_root
+from budget import CANCELLED as _CANCELLED_REASON
+from budget import BudgetExhausted, CancellationToken, SearchBudget
+from instrumentation import SearchStats
+
+CANCELLED = 'cancelled'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+
+# Jobs accepted beyond the ones that are running.
+DEFAULT_BACKLOG = 16
+
+# Seconds between two progress events of a job.
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+
+class ServiceBusy(Exception):
+    """Raised by `SolverService.submit` when the backlog is full."""
+
+
+class Job:
+    """A job of the service.
+
+    Attributes
+    ----------
+    id : int
+        The number of the job, also the `index` of its BatchResult.
+
+    instance : str or int
+        A puzzle input string or a queens board size.
+
+    algorithm : str
+        The name of the search, a key of `batch.ALGORITHMS`.
+
+    state : str
+        QUEUED, RUNNING or FINISHED.
+    """
+    def __init__(self, id, instance, algorithm, timeout, progress_interval, loop):
+        self.id = id
+        self.instance = instance
+        self.algorithm = algorithm
+        self.state = QUEUED
+        self._timeout = timeout
+        self._progress_interval = progress_interval
+        self._loop = loop
+        self._token = CancellationToken()
+        self._events = asyncio.Queue()
+        self._result = loop.create_future()
+
+    def cancel(self):
+        """Stops the job at its next expansion, or before it starts if it is queued."""
+        self._token.cancel()
+
+    async def result(self):
+        """Waits for the end of the job and returns its BatchResult."""
+        return await asyncio.shield(self._result)
+
+    async def events(self):
+        """Yields the events of the job as dicts: every 'progress' event, then
+        the 'result' event. The events are meant for a single consumer.
+        """
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    def _emit(self, event):
+        """Hands an event from the worker thread to the event loop."""
+        self._loop.call_soon_threadsafe(self._events.put_nowait, event)
+
+    def _run(self):
+        """Runs the search, in a worker thread."""
+        start = time.perf_counter()
+        if self._token.cancelled:
+            return BatchResult(self.id, CANCELLED, None, None, 0.0, None)
+        self.state = RUNNING
+        search = ALGORITHMS[self.algorithm]
+        budget = SearchBudget(time_limit=self._timeout, cancel=self._token)
+        stats = SearchStats()
+        bound = [None]
+        next_event = [start]
+
+        def on_expand(node, stats):
+            if bound[0] is None or node.f > bound[0]:
+                bound[0] = node.f
+            now = time.perf_counter()
+            if now >= next_event[0]:
+                next_event[0] = now + self._progress_interval
+                self._emit({'event': 'progress', 'job': self.id, 'expanded': stats.expanded,
+                            'generated': stats.generated, 'f': bound[0], 'elapsed': now - start})
+
+        options = {'stats': stats, 'on_expand': on_expand, 'budget': budget}
+        if self.algorithm == 'IDAstar':
+            # The threshold of the iteration is the f-bound of IDA*.
+            options['on_iteration'] = lambda threshold: bound.__setitem__(0, threshold)
+        try:
+            path = search(make_root(self.instance), **options)
+        except Exception as e:
+            return BatchResult(self.id, ERROR, None, None, time.perf_counter() - start, repr(e))
+        elapsed = time.perf_counter() - start
+        if isinstance(path, BudgetExhausted):
+            status = CANCELLED if path.reason == _CANCELLED_REASON else TIMEOUT
+            return BatchResult(self.id, status, None, None, elapsed, None)
+        if path is None:
+            return BatchResult(self.id, NO_SOLUTION, None, None, elapsed, None)
+        return BatchResult(self.id, SOLVED, [node.state for node in path], path[-1].g, elapsed, None)
+
+    def _finish(self, result):
+        self.state = FINISHED
+        self._result.set_result(result)
+        event = {'event': 'result'}
+        event.update(result._asdict())
+        self._events.put_nowait(event)
+        self._events.put_nowait(None)
+
+
+class SolverService:
+    """Runs search jobs on a bounded pool of threads.
+
+    Parameters
+    ----------
+    workers : int, optional
+        The number of jobs running at the same time. Default is 1.
+
+    backlog : int, optional
+        The number of admitted jobs waiting for a worker. Default is 16.
+
+    progress_interval : float, optional
+        The seconds between two progress events of a job. Default is 0.5.
+
+    Attributes
+    ----------
+    jobs : dict
+        The admitted jobs that are not finished, by id.
+    """
+    def __init__(self, workers=1, backlog=DEFAULT_BACKLOG, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+        self.workers = workers
+        self.backlog = backlog
+        self.progress_interval = progress_interval
+        self.jobs = {}
+        self._ids = count()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='solver')
+
+    def submit(self, instance, algorithm='Astar', timeout=None):
+        """Admits a job. It must be called from the event loop.
+
+        Parameters
+        ----------
+        instance : str or int
+            A puzzle input string (see NpuzzleNode) or a queens board size.
+
+        algorithm : str, optional
+            The name of the search: 'BFS', 'DFS', 'Astar' or 'IDAstar'. Default is 'Astar'.
+
+        timeout : float, optional
+            The maximum wall-clock time of the search, in seconds.
+
+        Returns
+        -------
+            job : Job
+                The admitted job.
+
+        Raises
+        ------
+        ServiceBusy
+            If `workers + backlog` jobs are already waiting or running.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError('unknown algorithm {!r}, expected one of {}'.format(algorithm, sorted(ALGORITHMS)))
+        if len(self.jobs) >= self.workers + self.backlog:
+            raise ServiceBusy('{} jobs are already waiting or running'.format(len(self.jobs)))
+        loop = asyncio.get_running_loop()
+        job = Job(next(self._ids), instance, algorithm, timeout, self.progress_interval, loop)
+        self.jobs[job.id] = job
+        future = loop.run_in_executor(self._executor, job._run)
+        future.add_done_callback(lambda future: self._done(job, future))
+        return job
+
+    async def solve(self, instance, algorithm='Astar', timeout=None):
+        """Submits a job and waits for its BatchResult."""
+        return await self.submit(instance, algorithm, timeout).result()
+
+    async def serve(self, host='127.0.0.1', port=0, path=None):
+        """Starts answering jobs over a TCP socket, or a Unix socket if `path` is given.
+
+        Returns
+        -------
+            server : asyncio.Server
+                The listening server; `server.sockets[0].getsockname()` gives
+                the port when it was chosen by the system (port 0).
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle, path)
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def close(self):
+        """Cancels the jobs and waits for the workers to stop."""
+        jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel()
+        for job in jobs:
+            await job.result()
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _done(self, job, future):
+        del self.jobs[job.id]
+        try:
+            result = future.result()
+        except BaseException as e:
+            result = BatchResult(job.id, ERROR, None, None, 0.0, repr(e))
+        job._finish(result)
+
+    async def _handle(self, reader, writer):
+        """Serves one connection: reads a job, streams its events, and cancels
+        it if they can no longer be written, i.e. the client went away.
+        """
+        job = None
+        try:
+            request = json.loads(await reader.readline())
+            try:
+                if not isinstance(request, dict):
+                    raise ValueError('the request must be a JSON object, got {!r}'.format(request))
+                job = self.submit(request['instance'], request.get('algorithm', 'Astar'), request.get('timeout'))
+            except (ServiceBusy, ValueError, KeyError, TypeError) as e:
+                writer.write(_line({'event': 'rejected', 'error': str(e)}))
+                await writer.drain()
+                return
+            # The end of the client's stream is not a reason to stop: it may just
+            # have shut down its side after sending the request.
+            async for event in job.events():
+                if writer.is_closing():
+                    raise ConnectionResetError('the client closed the connection')
+                writer.write(_line(event))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            if job is not None:
+                job.cancel()
+        finally:
+            writer.close()
+
+
+def _line(event):
+    return json.dumps(event).encode() + b'\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solves puzzle and queens jobs sent over a local socket.')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='the TCP port (default: 8765)')
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=1, help='the number of jobs running at once (default: 1)')
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG,
+                        help='the number of jobs waiting for a worker (default: {})'.format(DEFAULT_BACKLOG))
+    args = parser.parse_args()
+
+    async def run():
+        async with SolverService(args.workers, args.backlog) as service:
+            server = await service.serve(args.host, args.port, args.unix)
+            async with server:
+                await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""A dedicated solver for large superqueens boards.
+
+A superqueen moves like a queen and like a knight. As in NqueensNode, there
+is one queen per row and per column, and the cost of a placement is the
+number of pairs of queens on a common diagonal or a knight's move apart.
+
+The solver places the queens row by row and keeps the columns, both
+diagonals and the knight footprint of the queens already placed as integer
+bitmasks, so the free cells of a row are found with a few bit operations.
+Placements without attacks exist for every n >= 10 (and n = 1); for those
+boards a randomized backtracking search with restarts finds one quickly,
+even for n in the hundreds. For smaller boards a branch-and-bound search
+finds a placement with the minimum number of attacks.
+
+For boards with tens of thousands of rows, `min_conflicts` runs a local
+search instead: it starts from a greedy placement and swaps the columns of
+attacked queens with random other queens while that does not add attacks.
+
+Example
+-------
+>>> queen_positions = solve(300)
+>>> count_attacks(queen_positions)
+0
+>>> queen_positions, attacks = min_conflicts(50000, seed=1)
+>>> attacks
+0
+"""
+import random
+from math import inf
+
+# Up to this size, the search for a placement without attacks is exhaustive.
+_EXHAUSTIVE_SIZE = 12
+
+# Random columns tried per row by the greedy start of `min_conflicts`.
+_GREEDY_TRIES = 20
+
+_KNIGHT_MOVES = ((1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1))
+
+
+def solve(n, seed=0):
+    """Finds a placement of n superqueens with the fewest attacking pairs.
+
+    Parameters
+    ----------
+    n : int
+        The size of the board (n x n).
+
+    seed : int, optional
+        The seed of the randomized search on large boards. Default is 0.
+
+    Returns
+    -------
+        queen_positions : list of pairs
+            The (row, column) of the queen of every row, in the format of
+            `NqueensNode.queen_positions`.
+    """
+    if n <= _EXHAUSTIVE_SIZE:
+        columns = _place_without_attacks(n, None, inf)
+        if columns is None:
+            columns = _place_with_fewest_attacks(n)
+    else:
+        rng = random.Random(seed)
+        # Restart with a fresh random order, and a larger node limit, whenever a
+        # search gets lost in a subtree without solution.
+        limit = 4 * n
+        columns = None
+        while columns is None:
+            columns = _place_without_attacks(n, rng, limit)
+            limit += limit // 4
+    return list(enumerate(columns))
+
+
+def min_conflicts(n, seed=0, max_steps=None, restarts=20):
+    """Looks for a placement of n superqueens without attacks by local search.
+
+    The queens always form a permutation (one per row and per column), and a
+    step swaps the columns of an attacked queen and of a random other queen.
+    A swap that adds attacks is undone. When `max_steps` swaps have not
+    removed every attack, the search restarts from a new greedy placement.
+
+    Parameters
+    ----------
+    n : int
+        The size of the board (n x n).
+
+    seed : int, optional
+        The seed of the random choices, for reproducible results. Default is 0.
+
+    max_steps : int, optional
+        The number of swaps tried before a restart. Default is 100 * n.
+
+    restarts : int, optional
+        The maximum number of restarts. Default is 20.
+
+    Returns
+    -------
+        (queen_positions, attacks) : (list of pairs, int)
+            The best placement found, in the format of `NqueensNode.queen_positions`,
+            and its number of attacking pairs (0 unless the search gave up).
+    """
+    rng = random.Random(seed)
+    if max_steps is None:
+        max_steps = 100 * n
+    best = None
+    for _ in range(restarts + 1):
+        board = _ConflictBoard(n, rng)
+        board.repair(max_steps)
+        if best is None or board.attacks < best.attacks:
+            best = board
+        if best.attacks == 0:
+            break
+    return list(enumerate(best.columns)), best.attacks
+
+
+class _ConflictBoard:
+    """A permutation of columns with the number of queens on every diagonal.
+
+    The knights' attacks of a queen are found by looking up the columns of
+    the four rows around it, so every count is updated in O(1) by a swap.
+    """
+    def __init__(self, n, rng):
+        self.n = n
+        self.rng = rng
+        self.columns = list(range(n))
+        self.diagonals = [0] * (2 * n - 1)
+        self.anti_diagonals = [0] * (2 * n - 1)
+        self._place_greedily()
+        self.attacks = sum(self.attacks_on(row) for row in range(n)) // 2
+
+    def _place_greedily(self):
+        """Fills the rows in order, each with the first of a few random free
+        columns that is not attacked by the queens above it.
+        """
+        n, columns, rng = self.n, self.columns, self.rng
+        diagonals, anti_diagonals = self.diagonals, self.anti_diagonals
+        for row in range(n):
+            for _ in range(_GREEDY_TRIES):
+                other = rng.randrange(row, n)
+                columns[row], columns[other] = columns[other], columns[row]
+                column = columns[row]
+                if (diagonals[row - column + n - 1] == 0 and anti_diagonals[row + column] == 0
+                        and (row < 1 or abs(columns[row - 1] - column) != 2)
+                        and (row < 2 or abs(columns[row - 2] - column) != 1)):
+                    break
+            diagonals[row - column + n - 1] += 1
+            anti_diagonals[row + column] += 1
+
+    def attacks_on(self, row):
+        """The number of queens attacking the queen of `row`."""
+        n, columns = self.n, self.columns
+        column = columns[row]
+        attacks = self.diagonals[row - column + n - 1] + self.anti_diagonals[row + column] - 2
+        for d_row, d_column in _KNIGHT_MOVES:
+            other = row + d_row
+            if 0 <= other < n and columns[other] == column + d_column:
+                attacks += 1
+        return attacks
+
+    def _attack_each_other(self, row, other):
+        d_row, d_column = abs(row - other), abs(self.columns[row] - self.columns[other])
+        return d_row == d_column or d_row + d_column == 3
+
+    def swap(self, row, other):
+        """Swaps the columns of two queens and returns the change of the number of attacks."""
+        n, columns = self.n, self.columns
+        diagonals, anti_diagonals = self.diagonals, self.anti_diagonals
+        before = self.attacks_on(row) + self.attacks_on(other) - self._attack_each_other(row, other)
+        column, other_column = columns[row], columns[other]
+        diagonals[row - column + n - 1] -= 1
+        anti_diagonals[row + column] -= 1
+        diagonals[other - other_column + n - 1] -= 1
+        anti_diagonals[other + other_column] -= 1
+        columns[row], columns[other] = other_column, column
+        diagonals[row - other_column + n - 1] += 1
+        anti_diagonals[row + other_column] += 1
+        diagonals[other - column + n - 1] += 1
+        anti_diagonals[other + column] += 1
+        after = self.attacks_on(row) + self.attacks_on(other) - self._attack_each_other(row, other)
+        self.attacks += after - before
+        return after - before
+
+    def repair(self, max_steps):
+        """Swaps attacked queens with random ones, keeping the swaps that do not
+        add attacks, until there is no attack left or `max_steps` swaps were tried.
+        """
+        n, rng = self.n, self.rng
+        steps = 0
+        while self.attacks and steps < max_steps and n > 1:
+            for row in [row for row in range(n) if self.attacks_on(row)]:
+                while self.attacks_on(row) and steps < max_steps:
+                    other = rng.randrange(n)
+                    if other == row:
+                        continue
+                    steps += 1
+                    if self.swap(row, other) > 0:
+                        self.swap(row, other)
+
+
+def count_attacks(queen_positions):
+    """Counts the pairs of queens on a common column or diagonal, or a knight's move apart.
+
+    Parameters
+    ----------
+    queen_positions : list of pairs
+        The (row, column) of every queen, one queen per row.
+
+    Returns
+    -------
+        attacks : int
+            The number of attacking pairs. For a complete placement found by
+            `solve`, it is the g of the matching goal NqueensNode.
+    """
+    columns, diagonals, anti_diagonals = {}, {}, {}
+    column_of_row = dict(queen_positions)
+    attacks = 0
+    for row, column in queen_positions:
+        for counts, key in ((columns, column), (diagonals, row - column), (anti_diagonals, row + column)):
+            attacks += counts.get(key, 0)
+            counts[key] = counts.get(key, 0) + 1
+        # Only the knight's moves to the previous rows, so every pair is counted once.
+        for d_row, d_column in ((1, 2), (1, -2), (2, 1), (2, -1)):
+            if column_of_row.get(row - d_row) == column + d_column:
+                attacks += 1
+    return attacks
+
+
+def _place_without_attacks(n, rng, limit):
+    """Backtracking search for a placement without attacks.
+
+    The state of row r is the set of columns taken, the two diagonal masks
+    (shifted by one column at every row) and the knight footprints on rows r
+    and r + 1 of the queens already placed.
+
+    Parameters
+    ----------
+    rng : random.Random or None
+        Shuffles the columns tried in every row. None tries them in order.
+
+    limit : int or float
+        The maximum number of queens placed before giving up.
+
+    Returns
+    -------
+        columns : list of int or None
+            The column of the queen of every row, or None if there is no
+            placement without attacks or the limit was hit.
+    """
+    if n == 0:
+        return []
+    full = (1 << n) - 1
+    taken, diagonal, anti_diagonal, knight, next_knight = [0] * n, [0] * n, [0] * n, [0] * n, [0] * n
+    candidates = [None] * n
+    placed = [0] * n
+    candidates[0] = _bits(full, rng)
+    row = 0
+    nodes = 0
+    while row >= 0:
+        if not candidates[row]:
+            row -= 1
+            continue
+        bit = candidates[row].pop()
+        placed[row] = bit
+        nodes += 1
+        if row == n - 1:
+            return [bit.bit_length() - 1 for bit in placed]
+        if nodes > limit:
+            return None
+        r = row + 1
+        taken[r] = taken[row] | bit
+        diagonal[r] = ((diagonal[row] | bit) << 1) & full
+        anti_diagonal[r] = (anti_diagonal[row] | bit) >> 1
+        knight[r] = (next_knight[row] | bit << 2 | bit >> 2) & full
+        next_knight[r] = (bit << 1 | bit >> 1) & full
+        candidates[r] = _bits(full & ~(taken[r] | diagonal[r] | anti_diagonal[r] | knight[r]), rng)
+        row = r
+    return None
+
+
+def _bits(mask, rng):
+    """Returns the set bits of `mask` as a list, in the order they should be tried (last first)."""
+    bits = []
+    while mask:
+        bit = mask & -mask
+        bits.append(bit)
+        mask ^= bit
+    if rng is None:
+        bits.reverse()
+    else:
+        rng.shuffle(bits)
+    return bits
+
+
+def _place_with_fewest_attacks(n):
+    """Branch-and-bound search for a placement with the fewest attacks, one queen
+    per row and per column. Meant for the small boards without a perfect placement.
+    """
+    diagonals = [0] * (2 * n - 1)
+    anti_diagonals = [0] * (2 * n - 1)
+    columns = []
+    best_columns, best_attacks = None, inf
+
+    def place(row, used, attacks):
+        nonlocal best_columns, best_attacks
+        if attacks >= best_attacks:
+            return
+        if row == n:
+            best_columns, best_attacks = list(columns), attacks
+            return
+        for column in range(n):
+            if used >> column & 1:
+                continue
+            added = diagonals[row - column + n - 1] + anti_diagonals[row + column]
+            if row >= 1 and abs(columns[row - 1] - column) == 2:
+                added += 1
+            if row >= 2 and abs(columns[row - 2] - column) == 1:
+                added += 1
+            diagonals[row - column + n - 1] += 1
+            anti_diagonals[row + column] += 1
+            columns.append(column)
+            place(row + 1, used | 1 << column, attacks + added)
+            columns.pop()
+            diagonals[row - column + n - 1] -= 1
+            anti_diagonals[row + column] -= 1
+
+    place(0, 0, 0)
+    return best_columns
@@ -3,9 +3,27 @@ NOTE: Do not rely on these tests as they are just simple examples.
 Your code will be tested on some secret instances of the problems!
 """
 
+import asyncio
+import json
+import os
+import signal
+import shutil
+import tempfile
 import unittest
-from problems import NpuzzleNode, NqueensNode
-from search import Astar,DFS,BFS
+import batch
+import batched
+import benchmark
+import budget
+import cache
+import checkpoint
+import external_bfs
+import parallel
+import pattern_db
+import records
+import service
+import superqueens
+from problems import NpuzzleNode, NqueensNode, PackedNpuzzleNode
+from search import Astar,ARAstar,DFS,BFS,IDAstar,BidirectionalBFS,BidirectionalAstar,SearchStats
 from copy import deepcopy
 def is_attack_queen(queen1, queen2):
     y1, x1 = queen1
@@ -79,6 +97,51 @@ class TestNpuzzle(unittest.TestCase):
         children = npuzzle_root.generate_children()
         self.assertTrue(len(children) == 4) 
 
+    def test_incremental_child_heuristic(self):
+        """Test that the heuristic carried over to the children equals the one computed from scratch.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        root = NpuzzleNode(input_str=input_str)
+        node = root
+        for _ in range(6):
+            for child in node.generate_children():
+                fresh = NpuzzleNode(board=[list(row) for row in child.board])
+                self.assertEqual(child.f - child.g, fresh.f)
+                self.assertEqual(child.state, fresh.state)
+            node = node.generate_children()[-1]
+        # The rows shared with the children must not have been modified.
+        self.assertEqual(input_str.split(), [str(n) for row in root.board for n in row])
+
+    def test_lazy_successors(self):
+        """Test that the successors skip the move back to the parent, come in
+        order of f, and build the same children as generate_children.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        for root in (NpuzzleNode(input_str=input_str), PackedNpuzzleNode(input_str=input_str)):
+            node = root.generate_children()[0]
+            successors = list(node.successors())
+            bounds = [bound for bound, _ in successors]
+            self.assertEqual(bounds, sorted(bounds))
+            built = [build() for _, build in successors]
+            self.assertEqual([child.f for child in built], bounds)
+            expected = {child.state: child.f for child in node.generate_children() if child.state != root.state}
+            self.assertEqual({child.state: child.f for child in built}, expected)
+
+    def test_lazy_expansion_prunes_ida_star(self):
+        """Test that IDA* and DFS still solve the puzzle with the lazy successors,
+        and that IDA* builds fewer children than it expands nodes times the branching factor.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        stats = SearchStats()
+        path = IDAstar(NpuzzleNode(input_str=input_str), stats=stats)
+        self.assertEqual(path[-1].g, Astar(NpuzzleNode(input_str=input_str))[-1].g)
+        self.assertTrue(path[-1].is_goal())
+        self.assertLess(stats.generated, 2 * stats.expanded)
+        path = DFS(NpuzzleNode(input_str=input_str))
+        self.assertTrue(path[-1].is_goal())
+        for parent, child in zip(path, path[1:]):
+            self.assertIn(child.state, [c.state for c in parent.generate_children()])
+
     def test_a_star_algorithm(self):
         """Test that the length of the solution to a sample initial configuration is correct,
         and the last state is the goal.
@@ -88,7 +151,82 @@ class TestNpuzzle(unittest.TestCase):
         npuzzle_path = Astar(npuzzle_root)
         self.assertEqual(len(npuzzle_path), 3)
         self.assertTrue(npuzzle_path[-1].is_goal())
+
+    def test_a_star_matches_bfs_optimum(self):
+        """Test that A* returns a path as short as the BFS one and is deterministic across runs.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        first = Astar(NpuzzleNode(input_str=input_str))
+        second = Astar(NpuzzleNode(input_str=input_str))
+        self.assertEqual(len(first), 10)
+        self.assertEqual([n.state for n in first], [n.state for n in second])
     
+    def test_weighted_a_star(self):
+        """Test that weighted A* stays within its weight of the optimal cost.
+        """
+        for name, input_str in benchmark.make_puzzle_corpus(seed=3, walks=(30,), per_walk=2):
+            optimal = Astar(NpuzzleNode(input_str=input_str))[-1].g
+            for weight in (1.5, 3):
+                path = Astar(NpuzzleNode(input_str=input_str), weight=weight)
+                self.assertTrue(path[-1].is_goal())
+                self.assertLessEqual(path[-1].g, weight * optimal)
+            self.assertEqual(Astar(NpuzzleNode(input_str=input_str), weight=1, lightweight=True)[-1].g, optimal)
+
+    def test_anytime_a_star(self):
+        """Test that ARA* improves its solution and bound until the solution is proven optimal.
+        """
+        for name, input_str in benchmark.make_puzzle_corpus(seed=3, walks=(30,), per_walk=2):
+            optimal = Astar(NpuzzleNode(input_str=input_str))[-1].g
+            results = list(ARAstar(NpuzzleNode(input_str=input_str), weight=4, decrement=1))
+            costs = [path[-1].g for path, _ in results]
+            bounds = [bound for _, bound in results]
+            self.assertEqual(costs, sorted(costs, reverse=True))
+            self.assertEqual(bounds, sorted(bounds, reverse=True))
+            for cost, bound in zip(costs, bounds):
+                self.assertLessEqual(cost, bound * optimal)
+            self.assertEqual((costs[-1], bounds[-1]), (optimal, 1))
+            self.assertTrue(results[-1][0][-1].is_goal())
+        # Running out of budget before the first solution is told apart from having no solution.
+        rounds = ARAstar(NpuzzleNode(input_str=input_str), budget=budget.SearchBudget(max_expansions=3))
+        with self.assertRaises(StopIteration) as stop:
+            next(rounds)
+        self.assertIsInstance(stop.exception.value, budget.BudgetExhausted)
+        rounds = ARAstar(NpuzzleNode(input_str='2 1\n3 0'))
+        with self.assertRaises(StopIteration) as stop:
+            next(rounds)
+        self.assertIsNone(stop.exception.value)
+
+    def test_ida_star_algorithm(self):
+        """Test that IDA* finds an optimal path and reports increasing f-thresholds.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        thresholds = []
+        npuzzle_path = IDAstar(NpuzzleNode(input_str=input_str), on_iteration=thresholds.append)
+        self.assertEqual(len(npuzzle_path), 10)
+        self.assertTrue(npuzzle_path[-1].is_goal())
+        self.assertEqual(thresholds, sorted(set(thresholds)))
+        self.assertEqual(thresholds[-1], 9)
+
+    def test_goal_node(self):
+        """Test that goal_node builds the solved board for any board size.
+        """
+        self.assertTrue(NpuzzleNode.goal_node().is_goal())
+        self.assertEqual(str(NpuzzleNode.goal_node(3)), '  1  2  3\n  4  5  6\n  7  8   \n')
+        self.assertTrue(NpuzzleNode.goal_node(3).is_goal())
+
+    def test_bidirectional_algorithms(self):
+        """Test that both bidirectional searches return a connected optimal path from the root to the goal.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        for search in (BidirectionalBFS, BidirectionalAstar):
+            npuzzle_root = NpuzzleNode(input_str=input_str)
+            npuzzle_path = search(npuzzle_root)
+            self.assertEqual(len(npuzzle_path), 10)
+            self.assertIs(npuzzle_path[0], npuzzle_root)
+            self.assertTrue(npuzzle_path[-1].is_goal())
+            for parent, child in zip(npuzzle_path, npuzzle_path[1:]):
+                self.assertIs(child.parent, parent)
+
     def test_bfs_algorithm(self):
         """Test that the length of the solution to a sample initial configuration is correct,
         and the last state is the goal.
@@ -98,6 +236,609 @@ class TestNpuzzle(unittest.TestCase):
         npuzzle_path = BFS(npuzzle_root)
         self.assertTrue(npuzzle_path[-1].is_goal())
 
+    def test_bfs_detects_repeated_states(self):
+        """Test that BFS finds the shortest path of a deeper instance without re-expanding boards.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        npuzzle_root = NpuzzleNode(input_str=input_str)
+        npuzzle_path = BFS(npuzzle_root)
+        self.assertEqual(len(npuzzle_path), 10)
+        self.assertTrue(npuzzle_path[-1].is_goal())
+        states = [node.state for node in npuzzle_path]
+        self.assertEqual(len(states), len(set(states)))
+
+
+class TestPackedNpuzzle(unittest.TestCase):
+    def test_constucting_instances(self):
+        """Test that the packed node parses and prints boards like NpuzzleNode and has no instance dict.
+        """
+        input_str = '1  2  3  4\n5  6  7  8\n9 10  0 11\n13 14 15 12'
+        packed_root = PackedNpuzzleNode(input_str=input_str)
+        self.assertEqual(str(packed_root), str(NpuzzleNode(input_str=input_str)))
+        self.assertEqual(packed_root.f, NpuzzleNode(input_str=input_str).f)
+        self.assertFalse(hasattr(packed_root, '__dict__'))
+        self.assertTrue(PackedNpuzzleNode.goal_node().is_goal())
+        self.assertTrue(PackedNpuzzleNode.goal_node(3).is_goal())
+
+    def test_a_star_algorithm(self):
+        """Test that A* on the packed node follows the same boards as on NpuzzleNode.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        packed_path = Astar(PackedNpuzzleNode(input_str=input_str))
+        npuzzle_path = Astar(NpuzzleNode(input_str=input_str))
+        self.assertEqual([str(n) for n in packed_path], [str(n) for n in npuzzle_path])
+        self.assertTrue(packed_path[-1].is_goal())
+
+    def test_overridden_heuristic(self):
+        """Test that a subclass overriding the heuristic can be expanded, by A* and by IDA*'s lazy successors.
+        """
+        class BlindPackedNpuzzleNode(PackedNpuzzleNode):
+            __slots__ = ()
+
+            def evaluate_heuristic(self):
+                return 0
+        input_str = '1 2 3\n4 0 6\n7 5 8'
+        for search in (Astar, IDAstar):
+            path = search(BlindPackedNpuzzleNode(input_str=input_str))
+            self.assertEqual(len(path), 3)
+            self.assertTrue(path[-1].is_goal())
+            self.assertEqual([node.f for node in path], [0, 1, 2])
+
+    def test_rejects_large_boards(self):
+        """Test that boards that do not fit in 4 bits per cell are rejected.
+        """
+        with self.assertRaises(ValueError):
+            PackedNpuzzleNode(board=[list(range(r * 5, r * 5 + 5)) for r in range(5)])
+
+
+class TestPatternDatabase(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.pdb')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_loaded_tables_match_built_tables(self):
+        """Test that the memory-mapped tables give the same values as the freshly built ones.
+        """
+        built = pattern_db.build(self.path, size=3)
+        with pattern_db.load(self.path) as loaded:
+            self.assertEqual(loaded.partition, built.partition)
+            for state in [(1, 2, 3, 4, 5, 6, 7, 8, 0), (8, 6, 7, 2, 5, 4, 3, 0, 1), (0, 1, 2, 3, 4, 5, 6, 7, 8)]:
+                self.assertEqual(loaded.evaluate(state), built.evaluate(state))
+            self.assertEqual(loaded.evaluate((1, 2, 3, 4, 5, 6, 7, 8, 0)), 0)
+
+    def test_a_star_with_pattern_database(self):
+        """Test that the pattern database heuristic dominates Manhattan distance and keeps A* optimal.
+        """
+        pattern_db.build(self.path, size=3)
+        with pattern_db.load(self.path) as tables:
+            class PdbNpuzzleNode(NpuzzleNode):
+                pattern_db = tables
+            input_str = '8 6 7\n2 5 4\n3 0 1'
+            pdb_root = PdbNpuzzleNode(input_str=input_str)
+            manhattan_root = NpuzzleNode(input_str=input_str)
+            self.assertGreaterEqual(pdb_root.f, manhattan_root.f)
+            self.assertEqual(len(Astar(pdb_root)), len(Astar(manhattan_root)))
+            if batched.np is not None:
+                self.assertEqual(len(batched.BatchedAstar(pdb_root)), len(Astar(manhattan_root)))
+
+    def test_transposed_lookup(self):
+        """Test that a board and its transpose get the same pattern database heuristic.
+        """
+        pattern_db.build(self.path, size=3)
+        with pattern_db.load(self.path) as tables:
+            class PdbNpuzzleNode(NpuzzleNode):
+                pattern_db = tables
+            root = PdbNpuzzleNode(input_str='8 6 7\n2 5 4\n3 0 1')
+            transposed = PdbNpuzzleNode(input_str='6 4 7\n8 5 0\n3 2 1')
+            self.assertEqual(root.canonical_state(), transposed.canonical_state())
+            self.assertEqual(root.f, transposed.f)
+            self.assertGreaterEqual(root.f, tables.evaluate(root.state))
+            self.assertEqual(len(Astar(root, symmetry=True)), len(Astar(PdbNpuzzleNode(input_str='8 6 7\n2 5 4\n3 0 1'))))
+
+
+@unittest.skipIf(batched.np is None, 'NumPy is not installed')
+class TestBatchedSearch(unittest.TestCase):
+    input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+
+    def test_same_cost_as_node_searches(self):
+        """Test that the batched searches return optimal paths of nodes of the class of the root.
+        """
+        for search, reference in ((batched.BatchedBFS, BFS), (batched.BatchedAstar, Astar)):
+            for node_class in (NpuzzleNode, PackedNpuzzleNode):
+                root = node_class(input_str=self.input_str)
+                stats = SearchStats()
+                path = search(root, stats=stats)
+                self.assertEqual(len(path), len(reference(node_class(input_str=self.input_str))))
+                self.assertIs(path[0], root)
+                self.assertTrue(path[-1].is_goal())
+                for parent, child in zip(path, path[1:]):
+                    self.assertIs(child.parent, parent)
+                self.assertGreater(stats.expanded, 0)
+            self.assertEqual(len(search(NpuzzleNode.goal_node(3))), 1)
+
+    def test_unsolvable_and_budget(self):
+        """Test that an unsolvable board sweeps its whole half of the state space, and that budgets are honoured.
+        """
+        for search in (batched.BatchedBFS, batched.BatchedAstar):
+            stats = SearchStats()
+            self.assertIsNone(search(NpuzzleNode(input_str='2 1 3\n4 5 6\n7 8 0'), stats=stats))
+            self.assertEqual(stats.expanded, 181440)
+            result = search(NpuzzleNode(input_str=self.input_str), budget=budget.SearchBudget(max_expansions=5))
+            self.assertEqual(result.reason, budget.EXPANSIONS)
+        with self.assertRaises(ValueError):
+            batched.BatchedBFS(NpuzzleNode(board=[[i * 5 + j for j in range(5)] for i in range(5)]))
+
+
+class TestExternalBFS(unittest.TestCase):
+    # The number of 8-puzzle boards at every distance from the goal.
+    counts = [1, 2, 4, 8, 16, 20, 39, 62, 116, 152, 286, 396, 748, 1024, 1893, 2512, 4485, 5638,
+              9529, 10878, 16993, 17110, 23952, 20224, 24047, 15578, 14560, 6274, 3910, 760, 221, 2]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_layer_counts_and_resume(self):
+        """Test that an interrupted sweep resumes from its last layer and counts every state once.
+        """
+        self.assertEqual(external_bfs.sweep(self.directory, size=3, max_depth=12), self.counts[:13])
+        result = external_bfs.sweep(self.directory, size=3, budget=budget.SearchBudget(max_expansions=1000))
+        self.assertEqual(result.reason, budget.EXPANSIONS)
+        # The limit is checked every 4096 states, so layers 13 and 14 were completed.
+        self.assertEqual(result.expansions, self.counts[12] + self.counts[13])
+        # Leftovers of a crash while the next layer was being written.
+        for name in ('run-0.bin', 'layer-15.bin.tmp'):
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(b'\xff' * 24)
+        stats = SearchStats()
+        self.assertEqual(external_bfs.sweep(self.directory, size=3, run_size=5000, stats=stats), self.counts)
+        self.assertEqual(stats.expanded, sum(self.counts[14:]))
+        self.assertEqual(sorted(os.listdir(self.directory)), ['layer-31.bin', 'layer-32.bin', 'manifest.json'])
+        with self.assertRaises(ValueError):
+            external_bfs.sweep(self.directory, size=3, distances=True)
+
+    def test_distance_table_heuristic(self):
+        """Test that the distance table is the exact heuristic: A* only expands the solution path.
+        """
+        external_bfs.sweep(self.directory, size=3, distances=True)
+        with external_bfs.load(os.path.join(self.directory, external_bfs.DISTANCE_FILE)) as table:
+            class ExactNpuzzleNode(NpuzzleNode):
+                pattern_db = table
+            self.assertEqual(len(table), sum(self.counts))
+            input_str = '8 6 7\n2 5 4\n3 0 1'
+            stats = SearchStats()
+            path = Astar(ExactNpuzzleNode(input_str=input_str), stats=stats)
+            self.assertEqual(len(path) - 1, len(self.counts) - 1)
+            self.assertEqual(stats.expanded, len(path) - 1)
+            self.assertEqual(table.evaluate((2, 1, 3, 4, 5, 6, 7, 8, 0)), float('inf'))
+            if batched.np is not None:
+                self.assertEqual(len(batched.BatchedAstar(ExactNpuzzleNode(input_str=input_str))), len(path))
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.ckpt')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_resume_after_budget(self):
+        """Test that a search stopped by its budget many times resumes to the same path and counters.
+        """
+        input_str = '8 6 7\n2 5 4\n3 0 1'
+        for search in (Astar, IDAstar):
+            expected_stats = SearchStats()
+            expected = search(NpuzzleNode(input_str=input_str), stats=expected_stats)
+            saver = checkpoint.Checkpoint(self.path)
+            stats = SearchStats()
+            result = search(NpuzzleNode(input_str=input_str), stats=stats, checkpoint=saver,
+                            budget=budget.SearchBudget(max_expansions=2000))
+            while isinstance(result, budget.BudgetExhausted):
+                stats = SearchStats()
+                result = checkpoint.resume(self.path, stats=stats, checkpoint=saver,
+                                           budget=budget.SearchBudget(max_expansions=2000))
+            self.assertGreater(saver.saves, 1)
+            self.assertEqual([node.state for node in result], [node.state for node in expected])
+            self.assertEqual(stats.expanded, expected_stats.expanded)
+            for parent, child in zip(result, result[1:]):
+                self.assertIs(child.parent, parent)
+
+    def test_snapshot_on_signal(self):
+        """Test that a signal saves a snapshot without stopping the search, and that it can be resumed.
+        """
+        saver = checkpoint.Checkpoint(self.path)
+        previous = signal.getsignal(signal.SIGUSR1)
+        saver.on_signal(signal.SIGUSR1)
+        self.addCleanup(signal.signal, signal.SIGUSR1, previous)
+
+        def on_expand(node, stats):
+            if stats.expanded == 50:
+                os.kill(os.getpid(), signal.SIGUSR1)
+        for search in (Astar, IDAstar):
+            path = search(NqueensNode(n=7), checkpoint=saver, on_expand=on_expand)
+            self.assertEqual(checkpoint.load(self.path)['search'], search.__name__)
+            resumed = checkpoint.resume(self.path)
+            self.assertEqual([node.state for node in resumed], [node.state for node in path])
+        self.assertEqual(saver.saves, 2)
+
+
+class TestSolutionCache(unittest.TestCase):
+    input_str = '8 6 7\n2 5 4\n3 0 1'
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_memory_and_disk_tiers(self):
+        """Test that solutions and goal distances are answered from memory, then from the file in a new cache.
+        """
+        expected = [node.state for node in Astar(NpuzzleNode(input_str=self.input_str))]
+        with cache.SolutionCache(self.path, max_entries=100) as solutions:
+            self.assertEqual([node.state for node in solutions.solve(Astar, NpuzzleNode(input_str=self.input_str))],
+                             expected)
+            root = NpuzzleNode(input_str=self.input_str)
+            path = solutions.solve(Astar, root)
+            self.assertIs(path[0], root)
+            self.assertEqual([node.state for node in path], expected)
+            self.assertEqual((solutions.hits, solutions.misses), (1, 1))
+            self.assertLessEqual(len(solutions._memory), 100)
+        with cache.SolutionCache(self.path) as solutions:
+            astar = solutions.cached(Astar)
+            stats = SearchStats()
+            # A state of the cached path is answered from its goal distances, even by another algorithm.
+            middle = path[10]
+            self.assertEqual(solutions.goal_distance(middle), path[-1].g - middle.g)
+            resumed = solutions.cached(IDAstar)(NpuzzleNode(board=middle.board), stats=stats)
+            self.assertEqual([node.state for node in resumed], expected[10:])
+            self.assertEqual(stats.expanded, 0)
+            self.assertEqual([node.state for node in astar(NpuzzleNode(input_str=self.input_str))], expected)
+            self.assertEqual(solutions.hits, 2)
+            # Weighted A* and BFS paths are cached under their own keys, without distances.
+            self.assertIsNone(solutions.goal_distance(NpuzzleNode(input_str='1 2 3\n4 5 6\n0 7 8')))
+            solutions.solve(Astar, NpuzzleNode(input_str='1 2 3\n4 5 6\n0 7 8'), weight=2)
+            self.assertIsNone(solutions.goal_distance(NpuzzleNode(input_str='1 2 3\n4 5 6\n0 7 8')))
+            self.assertIsNone(solutions.solve(BFS, NpuzzleNode(input_str='2 1\n3 0')))
+            self.assertIsNone(solutions.solve(BFS, NpuzzleNode(input_str='2 1\n3 0')))
+            self.assertEqual(solutions.misses, 2)
+
+    def test_search_stops_at_cached_states(self):
+        """Test that searches reaching cached states splice their paths and stay optimal.
+        """
+        with cache.SolutionCache(self.path, max_disk_entries=40) as solutions:
+            for node_class in (NpuzzleNode, PackedNpuzzleNode):
+                path = solutions.solve(Astar, node_class(input_str=self.input_str))
+                # A board one move off the cached path.
+                on_path = {path[9].state, path[11].state}
+                board = next(child.board for child in path[10].generate_children() if child.state not in on_path)
+                for search in (Astar, IDAstar):
+                    root = node_class(board=board)
+                    found = solutions.solve(search, root)
+                    self.assertIs(found[0], root)
+                    self.assertTrue(found[-1].is_goal())
+                    self.assertEqual(found[-1].g, search(node_class(board=board))[-1].g)
+                    for parent, child in zip(found, found[1:]):
+                        self.assertIs(child.parent, parent)
+            for n in (6, 7):
+                self.assertEqual(solutions.solve(IDAstar, NqueensNode(n=n))[-1].g, Astar(NqueensNode(n=n))[-1].g)
+            self.assertEqual(solutions.goal_distance(NqueensNode(n=7)), Astar(NqueensNode(n=7))[-1].g)
+            for table in ('solutions', 'distances'):
+                self.assertLessEqual(solutions._db.execute('SELECT COUNT(*) FROM ' + table).fetchone()[0], 40)
+
+
+    def test_eviction_keeps_paths_complete(self):
+        """Test that the rows left after eviction always lead to the goal, also after reading parts of paths.
+        """
+        boards = ['8 6 7\n2 5 4\n3 0 1', '1 2 3\n4 5 6\n0 7 8', '4 1 3\n7 2 6\n0 5 8', '1 2 3\n0 4 6\n7 5 8']
+        with cache.SolutionCache(self.path, max_entries=1, max_disk_entries=30) as solutions:
+            for input_str in boards:
+                path = solutions.solve(Astar, NpuzzleNode(input_str=input_str))
+                # Reading the end of the first path makes it more recent than its start.
+                solutions.goal_distance(path[len(path) // 2])
+                rows = solutions._db.execute('SELECT state, next_state FROM distances').fetchall()
+                states = {state for state, _ in rows}
+                self.assertLessEqual(len(rows), 30)
+                for state, next_state in rows:
+                    self.assertTrue(next_state is None or next_state in states)
+
+class TestSolverService(unittest.TestCase):
+    # Far too hard for BFS: these jobs only end when they are cancelled.
+    endless = '15 14 13 12\n11 10 9 8\n7 6 5 4\n3 1 2 0'
+
+    def test_admission_progress_and_cancellation(self):
+        """Test that the backlog is bounded, that progress is streamed, and that running and queued jobs can be cancelled.
+        """
+        async def run():
+            async with service.SolverService(workers=1, backlog=1, progress_interval=0) as solver:
+                running = solver.submit(self.endless, 'BFS')
+                queued = solver.submit(5, 'Astar')
+                with self.assertRaises(service.ServiceBusy):
+                    solver.submit(6)
+                queued.cancel()
+                events = []
+                async for event in running.events():
+                    events.append(event)
+                    if len(events) == 3:
+                        running.cancel()
+                self.assertEqual(events[0]['event'], 'progress')
+                self.assertGreater(events[1]['expanded'], events[0]['expanded'])
+                self.assertEqual((events[-1]['event'], events[-1]['status']), ('result', service.CANCELLED))
+                self.assertEqual((await queued.result()).status, service.CANCELLED)
+                result = await solver.solve(5, 'IDAstar')
+                self.assertEqual((result.status, result.cost), (batch.SOLVED, Astar(NqueensNode(n=5))[-1].g))
+                self.assertEqual(solver.jobs, {})
+        asyncio.run(run())
+
+    def test_socket(self):
+        """Test that jobs are served over a local socket, also to clients that shut down their side
+        after the request, and cancelled when their client disconnects.
+        """
+        async def request(port, job):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(json.dumps(job).encode() + b'\n')
+            await writer.drain()
+            return reader, writer
+
+        async def run():
+            async with service.SolverService(workers=1, backlog=0) as solver:
+                server = await solver.serve()
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await request(port, {'instance': '1 2 3\n4 5 6\n0 7 8', 'algorithm': 'Astar'})
+                events = [json.loads(line) async for line in reader]
+                writer.close()
+                self.assertEqual((events[-1]['event'], events[-1]['status'], events[-1]['cost']),
+                                 ('result', batch.SOLVED, 2))
+                self.assertEqual(events[-1]['path'][-1], [1, 2, 3, 4, 5, 6, 7, 8, 0])
+
+                reader, writer = await request(port, {'instance': 6, 'algorithm': 'IDAstar'})
+                writer.write_eof()
+                events = [json.loads(line) async for line in reader]
+                writer.close()
+                self.assertEqual((events[-1]['event'], events[-1]['status']), ('result', batch.SOLVED))
+                for job in ([1], 5, 'instance'):
+                    reader, writer = await request(port, job)
+                    self.assertEqual(json.loads(await reader.readline())['event'], 'rejected')
+                    writer.close()
+
+                reader, writer = await request(port, {'instance': self.endless, 'algorithm': 'BFS'})
+                while not solver.jobs:
+                    await asyncio.sleep(0.01)
+                job = next(iter(solver.jobs.values()))
+                busy_reader, busy_writer = await request(port, {'instance': 5})
+                self.assertEqual(json.loads(await busy_reader.readline())['event'], 'rejected')
+                busy_writer.close()
+                writer.close()
+                self.assertEqual((await job.result()).status, service.CANCELLED)
+                server.close()
+                await server.wait_closed()
+        asyncio.run(run())
+
+
+class TestSearchStats(unittest.TestCase):
+    def test_counters_and_callback(self):
+        """Test that every search fills the stats and calls on_expand once per expanded node.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        for search in (BFS, Astar, IDAstar, BidirectionalBFS, BidirectionalAstar):
+            stats, expanded = SearchStats(), []
+            path = search(NpuzzleNode(input_str=input_str), stats=stats,
+                          on_expand=lambda node, stats: expanded.append(node))
+            self.assertEqual(len(path), 10)
+            self.assertEqual(stats.expanded, len(expanded))
+            self.assertGreaterEqual(stats.generated, stats.expanded)
+            self.assertGreater(stats.max_closed, 0)
+            self.assertGreater(stats.generate_time, 0)
+            self.assertGreaterEqual(stats.total_time, stats.generate_time)
+
+    def test_instrumentation_leaves_the_class_alone(self):
+        """Test that the instrumentation does not replace the heuristic on the node class, during or after the search.
+        """
+        class SubNpuzzleNode(NpuzzleNode):
+            pass
+        input_str = '1  2  3  4\n5  6  7  8\n9 10  0 11\n13 14 15 12'
+        original = NpuzzleNode.__dict__['evaluate_heuristic']
+        seen = []
+        record = lambda node, stats: seen.append((type(node).evaluate_heuristic, 'evaluate_heuristic' in SubNpuzzleNode.__dict__))
+        for node_class in (NpuzzleNode, SubNpuzzleNode):
+            stats = SearchStats()
+            Astar(node_class(input_str=input_str), stats=stats, on_expand=record)
+        self.assertEqual(set(seen), {(original, False)})
+        self.assertIs(NpuzzleNode.__dict__['evaluate_heuristic'], original)
+
+    def test_dfs_on_queens(self):
+        """Test that DFS counts its expansions on the queens tree, which has no duplicate states.
+        """
+        stats = SearchStats()
+        DFS(NqueensNode(n=6), stats=stats)
+        self.assertEqual(stats.duplicates, 0)
+        self.assertGreater(stats.expanded, 0)
+
+
+class TestSearchBudget(unittest.TestCase):
+    input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+
+    def test_expansion_limit(self):
+        """Test that every search stops after the allowed expansions and returns its best partial node.
+        """
+        for search in (BFS, DFS, Astar, IDAstar, BidirectionalBFS, BidirectionalAstar):
+            root = NpuzzleNode(input_str=self.input_str)
+            result = search(root, budget=budget.SearchBudget(max_expansions=5))
+            self.assertIsInstance(result, budget.BudgetExhausted)
+            self.assertEqual(result.reason, budget.EXPANSIONS)
+            self.assertEqual(result.expansions, 5)
+            self.assertIs(result.best_node.get_path()[0], root)
+            self.assertLessEqual(result.best_node.f - result.best_node.g, root.f - root.g)
+
+    def test_deadline_and_cancellation(self):
+        """Test that a past deadline and a cancelled token stop the searches before any expansion.
+        """
+        token = budget.CancellationToken()
+        token.cancel()
+        for limits, reason in (({'time_limit': 0}, budget.DEADLINE), ({'cancel': token}, budget.CANCELLED)):
+            result = Astar(NpuzzleNode(input_str=self.input_str), budget=budget.SearchBudget(**limits))
+            self.assertEqual(result.reason, reason)
+            self.assertEqual(result.expansions, 0)
+            result = parallel.HDAstar(NpuzzleNode(input_str=self.input_str), processes=2,
+                                      budget=budget.SearchBudget(**limits))
+            self.assertEqual(result.reason, reason)
+
+    def test_sufficient_budget(self):
+        """Test that a budget that is not exhausted does not change the result, and is reset between runs.
+        """
+        limits = budget.SearchBudget(max_expansions=10 ** 5, time_limit=60, max_memory=2 ** 40)
+        for _ in range(2):
+            self.assertEqual(len(Astar(NpuzzleNode(input_str=self.input_str), budget=limits)), 10)
+
+
+class TestLightweightSearch(unittest.TestCase):
+    def test_same_path_as_full_search(self):
+        """Test that the lightweight searches return the same nodes, linked by their parents, as the full ones.
+        """
+        roots = (lambda: NpuzzleNode(input_str='5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'),
+                 lambda: PackedNpuzzleNode(input_str='1 2 3 4\n5 6 0 8\n9 10 7 11\n13 14 15 12'),
+                 lambda: NqueensNode(n=5))
+        for make_root in roots:
+            for search in (Astar, BFS):
+                root = make_root()
+                path = search(root, lightweight=True)
+                self.assertEqual([node.state for node in path], [node.state for node in search(make_root())])
+                self.assertEqual([node.g for node in path], [node.g for node in search(make_root())])
+                self.assertIs(path[0], root)
+                for parent, child in zip(path, path[1:]):
+                    self.assertIs(child.parent, parent)
+
+    def test_records(self):
+        """Test that the records rebuild the moves from the root.
+        """
+        table = records.SearchRecords()
+        root = table.add('a', records.NO_PARENT, 0, 0)
+        child = table.add('b', root, 2, 1)
+        table.add('c', root, 1, 1)
+        grandchild = table.add('d', child, 3, 2)
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table.moves_to(grandchild), [2, 3])
+        self.assertEqual(table.moves_to(root), [])
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_reproducible(self):
+        """Test that the seeded corpus is the same on every call and that walks bound the solution depth.
+        """
+        corpus = benchmark.make_puzzle_corpus(seed=7, walks=(4, 8), per_walk=2)
+        self.assertEqual(corpus, benchmark.make_puzzle_corpus(seed=7, walks=(4, 8), per_walk=2))
+        self.assertEqual([name for name, _ in corpus], ['walk4-0', 'walk4-1', 'walk8-0', 'walk8-1'])
+        for name, input_str in corpus:
+            walk = int(name[4:].split('-')[0])
+            self.assertLessEqual(len(Astar(NpuzzleNode(input_str=input_str))) - 1, walk)
+
+    def test_anytime_search_is_benchmarked(self):
+        """Test that ARA* is run by the benchmark and reported with the cost of its final, optimal round.
+        """
+        self.assertIn('ARAstar', benchmark.PUZZLE_ALGORITHMS)
+        self.assertIn('ARAstar', benchmark.QUEENS_ALGORITHMS)
+        report = benchmark.run_benchmark(algorithms=['Astar', 'ARAstar'], walks=(20,), per_walk=1, queens=(6,))
+        costs = {}
+        for result in report['results']:
+            self.assertEqual(result['status'], 'solved')
+            costs.setdefault((result['problem'], result['instance']), set()).add(result['cost'])
+        self.assertEqual(len(costs), 2)
+        for cost in costs.values():
+            self.assertEqual(len(cost), 1)
+
+    def test_queens_heuristic_comparison(self):
+        """Test that the heuristic reduces the expansions of A* on the queens without changing the cost.
+        """
+        for row in benchmark.compare_queens_heuristic(sizes=(5, 6), timeout=30):
+            self.assertEqual(row['cost'], row['blind_cost'])
+            self.assertLess(row['expanded'], row['blind_expanded'])
+
+    def test_compare_reports_regressions(self):
+        """Test that slower runs, lost solutions and changed costs are reported, and noise is not.
+        """
+        def result(instance, status, wall_time, cost):
+            return {'problem': 'npuzzle', 'instance': instance, 'algorithm': 'Astar',
+                    'status': status, 'wall_time': wall_time, 'cost': cost}
+        baseline = {'results': [result('a', 'solved', 1.0, 10), result('b', 'solved', 1.0, 10),
+                                result('c', 'solved', 1.0, 10), result('d', 'solved', 0.001, 10)]}
+        report = {'results': [result('a', 'solved', 1.1, 10), result('b', 'solved', 2.0, 10),
+                              result('c', 'timeout', None, None), result('d', 'solved', 0.01, 10)]}
+        regressions = benchmark.compare(report, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('npuzzle b Astar'))
+        self.assertTrue(regressions[1].startswith('npuzzle c Astar'))
+
+
+class TestBatch(unittest.TestCase):
+    def test_solve_batch(self):
+        """Test that every instance of a batch gets a picklable result, including timeouts and bad input.
+        """
+        instances = ['1  2  3  4\n5  6  7  8\n9 10  0 11\n13 14 15 12', 5, '8 6 7\n2 5 4\n3 0 1', 'not a board']
+        results = sorted(batch.solve_batch(instances, 'BFS', processes=2, timeout=0.3))
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3])
+        self.assertEqual([r.status for r in results], [batch.SOLVED, batch.SOLVED, batch.TIMEOUT, batch.ERROR])
+        self.assertEqual(results[0].cost, 2)
+        self.assertEqual(results[0].path[-1], NpuzzleNode.goal_node().state)
+        self.assertEqual(len(results[1].path[-1]), 5)
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            next(batch.solve_batch([7], 'Dijkstra'))
+
+
+class TestParallelAstar(unittest.TestCase):
+    def test_hda_star_matches_a_star(self):
+        """Test that HDA* returns a connected path with the optimal cost of the serial A*.
+        """
+        input_str = '5  1  2  4\n9  6  3  8\n13 10  7 11\n0 14 15 12'
+        npuzzle_root = NpuzzleNode(input_str=input_str)
+        npuzzle_path = parallel.HDAstar(npuzzle_root, processes=3)
+        self.assertEqual(len(npuzzle_path), len(Astar(NpuzzleNode(input_str=input_str))))
+        self.assertIs(npuzzle_path[0], npuzzle_root)
+        self.assertTrue(npuzzle_path[-1].is_goal())
+        for parent, child in zip(npuzzle_path, npuzzle_path[1:]):
+            self.assertIs(child.parent, parent)
+
+    def test_hda_star_on_queens(self):
+        """Test that HDA* finds a minimum-attack placement of the queens.
+        """
+        nqueens_path = parallel.HDAstar(NqueensNode(n=6), processes=2)
+        self.assertTrue(nqueens_path[-1].is_goal())
+        self.assertEqual(nqueens_path[-1].g, Astar(NqueensNode(n=6))[-1].g)
+
+
+class TestSuperqueensSolver(unittest.TestCase):
+    def test_minimum_attacks_on_small_boards(self):
+        """Test that the solver reaches the minimum attack count found by A* on the NqueensNode.
+        """
+        for n in range(1, 8):
+            goal = Astar(NqueensNode(n=n))[-1]
+            queen_positions = superqueens.solve(n)
+            self.assertEqual(superqueens.count_attacks(goal.queen_positions), goal.g)
+            self.assertEqual(superqueens.count_attacks(queen_positions), goal.g)
+            self.assertEqual(sorted(column for _, column in queen_positions), list(range(n)))
+
+    def test_large_boards(self):
+        """Test that large boards get a placement without attacks, in the NqueensNode format.
+        """
+        for n in (10, 57, 200):
+            queen_positions = superqueens.solve(n, seed=n)
+            self.assertEqual([row for row, _ in queen_positions], list(range(n)))
+            self.assertEqual(sorted(column for _, column in queen_positions), list(range(n)))
+            self.assertEqual(superqueens.count_attacks(queen_positions), 0)
+            self.assertEqual(count_attacks(queen_positions), 0)
+
+    def test_min_conflicts(self):
+        """Test that the local search is reproducible and reports the attack count of its placement.
+        """
+        queen_positions, attacks = superqueens.min_conflicts(3000, seed=4)
+        self.assertEqual(attacks, 0)
+        self.assertEqual(superqueens.count_attacks(queen_positions), 0)
+        self.assertEqual(sorted(column for _, column in queen_positions), list(range(3000)))
+        self.assertEqual(superqueens.min_conflicts(300, seed=9), superqueens.min_conflicts(300, seed=9))
+        queen_positions, attacks = superqueens.min_conflicts(6, restarts=2)
+        self.assertEqual(superqueens.count_attacks(queen_positions), attacks)
+        self.assertGreaterEqual(attacks, Astar(NqueensNode(n=6))[-1].g)
+
 
 class TestNQueens(unittest.TestCase):
     def test_constucting_instances(self):
@@ -125,6 +866,67 @@ class TestNQueens(unittest.TestCase):
         nqueens_root = NqueensNode(n=7)
         nqueens_root.generate_children()
 
+    def test_incremental_child_costs(self):
+        """Test that the children priced from the occupancy counters get the cost of a full recount.
+        """
+        nodes = [NqueensNode(n=8)]
+        # A root built from a partial placement has no counters to start from.
+        nodes.append(NqueensNode(queen_positions=[(0, 1), (1, 3), (2, 5)], n=8))
+        while nodes:
+            node = nodes.pop()
+            base = superqueens.count_attacks(node.queen_positions)
+            children = node.generate_children()
+            used = {column for _, column in node.queen_positions}
+            self.assertEqual([child.queen_positions[-1][1] for child in children],
+                             [column for column in range(8) if column not in used])
+            for child in children:
+                self.assertEqual(child.g - node.g, superqueens.count_attacks(child.queen_positions) - base)
+            nodes.extend(children[:2] if len(node.queen_positions) < 5 else [])
+
+    def test_lazy_successors(self):
+        """Test that the successor bounds never decrease and are lower bounds of the f of the built children.
+        """
+        node = NqueensNode(queen_positions=[(0, 1), (1, 3)], n=7)
+        successors = list(node.successors())
+        bounds = [bound for bound, _ in successors]
+        self.assertEqual(bounds, sorted(bounds))
+        built = [build() for _, build in successors]
+        for bound, child in zip(bounds, built):
+            self.assertLessEqual(bound, child.f)
+        self.assertEqual(sorted(child.state for child in built),
+                         sorted(child.state for child in node.generate_children()))
+        self.assertEqual(IDAstar(NqueensNode(n=6))[-1].g, Astar(NqueensNode(n=6))[-1].g)
+
+    def test_symmetry_reduction(self):
+        """Test that mirrored placements are explored once, which halves the work without changing the optimum.
+        """
+        for search in (Astar, BFS):
+            stats, reduced_stats = SearchStats(), SearchStats()
+            root = NqueensNode(n=6)
+            path = search(NqueensNode(n=6), stats=stats)
+            reduced_path = search(root, stats=reduced_stats, symmetry=True)
+            self.assertEqual(reduced_path[-1].g, path[-1].g)
+            self.assertLess(reduced_stats.expanded, 0.6 * stats.expanded)
+            self.assertIs(reduced_path[0], root)
+            for parent, child in zip(reduced_path, reduced_path[1:]):
+                self.assertIs(child.parent, parent)
+        self.assertEqual(NqueensNode(queen_positions=[(0, 1), (1, 4)], n=6).canonical_state(),
+                         NqueensNode(queen_positions=[(0, 4), (1, 1)], n=6).canonical_state())
+
+    def test_heuristic_is_admissible_and_consistent(self):
+        """Test that h never overestimates the attacks still to come and never drops by more than a move costs.
+        """
+        n = 6
+        nodes = [NqueensNode(n=n)]
+        while nodes:
+            node = nodes.pop()
+            h = node.f - node.g
+            self.assertLessEqual(h, Astar(NqueensNode(queen_positions=list(node.queen_positions), n=n))[-1].g)
+            for child in node.generate_children():
+                self.assertLessEqual(h, child.f - node.g)
+                if len(child.queen_positions) < 3:
+                    nodes.append(child)
+
     def test_a_star_algorithm(self):
         """Test that the length of the solution path is 8 when the board size is 7,
         the last state is the goal state, and there is no queen in the initial state."""